@@ -1,5 +1,84 @@
 import copy
+import math
+import multiprocessing
 import random
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from book import OpeningBook
+from endgame import EndgameSolver
+from quoridor import Quoridor
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+# Score of a won position (minus the number of plies to the win)
+WIN_SCORE = 1000000
+# Scores above it (or below minus it) are wins (losses), evaluations never reach it
+WIN_BOUND = WIN_SCORE - 10000
+
+
+def score_to_tt(score, ply):
+    """Return a score for the transposition table: plies to a win are counted from the node, not from the root."""
+    if score is not None and score >= WIN_BOUND:
+        return score + ply
+    if score is not None and score <= -WIN_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    """Return a score of the transposition table for a node at the ply (see score_to_tt)."""
+    if score is not None and score >= WIN_BOUND:
+        return score - ply
+    if score is not None and score <= -WIN_BOUND:
+        return score + ply
+    return score
+
+
+class DistanceCache:
+    """
+    LRU cache of distance maps.
+    A distance map depends only on walls (pawns are ignored), so it is keyed by walls on the board and a player.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.maps = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return a cached distance map or None."""
+        distances = self.maps.get(key)
+        if distances is None:
+            self.misses += 1
+            return None
+        self.maps.move_to_end(key)
+        self.hits += 1
+        return distances
+
+    def put(self, key, distances):
+        """Store a distance map and drop the least recently used one if the cache is full."""
+        self.maps[key] = distances
+        self.maps.move_to_end(key)
+        if len(self.maps) > self.maxsize:
+            self.maps.popitem(last=False)
+
+    def clear(self):
+        self.maps.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Return hits, misses, hit rate and size of the cache."""
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "size": len(self.maps),
+            "maxsize": self.maxsize
+        }
 
 
 class TestAI:
@@ -9,54 +88,95 @@ class TestAI:
     Can not use walls.
     """
 
-    def move(self, board, pawns_loc, walls, player):
-        """Return object to be moved and its coordinates."""
-        from runner import game
+    def __init__(self, cache_size=4096):
+        # Distance maps of already seen wall configurations
+        self.dist_cache = DistanceCache(cache_size)
+
+    def move(self, game, player):
+        """Return object to be moved and its coordinates for the player in the current position of the game."""
+        board, pawns_loc = game.board, game.pawns_loc
         item = "pawn"
         # Get all possible moves and choose which of them that is closer to finish
         available_moves = game.available_moves(board, pawns_loc[player])
-        distances = self.map_dist(board, player)
+        distances = self.map_dist(game, board, player)
         available_moves.sort(key=lambda cell: distances[cell[0]][cell[1]])
         i, j = available_moves[0]
         return item, None, i, j
 
-    def map_dist(self, board, player):
-        """Mapping distances from every cell to the win side of the board."""
-        from runner import game
+    def map_dist(self, game, board, player, flat=False):
+        """
+        Mapping distances from every cell to the win side of the board.
+        Return a matrix distances[i][j] or a list distances[i * width + j] when flat=True.
+        """
+        return self.map_dists(game, board, [player], flat)[player]
 
-        # Matrix for distances
-        max_value = game.width * game.height
-        distances = [[max_value for j in range(game.width)] for i in range(game.height)]
+    def map_dists(self, game, board, players=(1, 2), flat=False):
+        """
+        Mapping distances for several players in one pass (see map_dist).
+        Maps are taken from the cache when these walls were already seen (flat maps are shared, do not modify them).
+        """
+        walls_key = (game.height, game.width, game.walls_key(board))
+        maps = {}
+        for player in players:
+            distances = self.dist_cache.get((walls_key, player))
+            if distances is not None:
+                maps[player] = distances
+        missing = [player for player in players if player not in maps]
+        if missing:
+            for player, distances in game.distance_maps(board, missing).items():
+                self.dist_cache.put((walls_key, player), distances)
+                maps[player] = distances
+        if not flat:
+            width = game.width
+            for player, distances in maps.items():
+                maps[player] = [distances[i * width:(i + 1) * width] for i in range(game.height)]
+        return maps
 
-        # Add cells with known distances (first/last row) and add them to the frontier
-        if player == 1:
-            win_side = 0
-        elif player == 2:
-            win_side = game.height - 1
-        frontier = []
-        for j in range(game.width):
-            distances[win_side][j] = 0
-            frontier.append((win_side, j))
-
-        explored = []
-        new_frontier = frontier
-        while frontier:
-            frontier = new_frontier
-            for cell in frontier.copy():
-                i, j = cell[0], cell[1]
-                dist = distances[i][j]
-                for new_cell in game.available_moves(board, cell, planning=True):
-                    if new_cell not in frontier and new_cell not in explored:
-                        i, j = new_cell[0], new_cell[1]
-                        distances[i][j] = dist + 1
-                        frontier.append(new_cell)
-                        explored.append(new_cell)
-                frontier.remove(cell)
-                explored.append(cell)
-                new_frontier = frontier
-        # print(*distances, sep="\n", end="\n")
-        # print(type(distances[4][4]))
-        return distances
+    def map_dists_after_wall(self, game, board, maps, walls_key, loc, orientation):
+        """
+        Mapping distances after the wall was placed on the board (flat maps, see map_dist).
+        maps are flat maps before the wall and walls_key is game.walls_key of the board with the wall.
+        Only distances which depended on the blocked edges are recomputed.
+        """
+        new_maps = {}
+        for player, distances in maps.items():
+            key = ((game.height, game.width, walls_key), player)
+            new_distances = self.dist_cache.get(key)
+            if new_distances is None:
+                new_distances = game.update_distance_map(board, distances, loc, orientation, walls_key)
+                self.dist_cache.put(key, new_distances)
+            new_maps[player] = new_distances
+        return new_maps
+
+
+# The game of the last task in a worker process (tasks of one move share the state)
+_worker_game = None
+
+
+def rate_walls_worker(task):
+    """Rate walls in a worker process (see PrimitiveAI.rate_walls)."""
+    global _worker_game
+    settings, state, player, walls = task
+    height, width, walls_number, backend = settings
+    if _worker_game is None or _worker_game[0] != (settings, state):
+        game = Quoridor(height=height, width=width, walls_number=walls_number, backend=backend)
+        game.set_state(state)
+        _worker_game = ((settings, state), game, game.distance_maps(game.board))
+    game, maps = _worker_game[1], _worker_game[2]
+
+    opponent = 2 if player == 1 else 1
+    self_i, self_j = game.pawns_loc[player]
+    oppo_i, oppo_j = game.pawns_loc[opponent]
+    walls_key = game.walls_key(game.board)
+    deltas = []
+    for (i, j), orientation in walls:
+        game.apply_wall(game.board, (i, j), orientation)
+        new_walls_key = game.add_wall_to_key(walls_key, (i, j), orientation)
+        self_dist = game.update_distance_map(game.board, maps[player], (i, j), orientation, new_walls_key)
+        oppo_dist = game.update_distance_map(game.board, maps[opponent], (i, j), orientation, new_walls_key)
+        game.undo_wall(game.board, (i, j), orientation)
+        deltas.append((((i, j), orientation), self_dist[self_i * width + self_j] - oppo_dist[oppo_i * width + oppo_j]))
+    return deltas
 
 
 class PrimitiveAI(TestAI):
@@ -65,20 +185,126 @@ class PrimitiveAI(TestAI):
     with respect to opponent's shortest distance.
     Can use walls.
     """
-    def move(self, board, pawns_loc, walls, player):
+
+    def __init__(self, cache_size=4096, transposition_table=None, pruning=False, pruning_radius=2,
+                 compare_pruning=False, workers=1, endgame=True, book=None):
+        super().__init__(cache_size)
+        # Optional opening book (OpeningBook or a path of a book file)
+        self.book = OpeningBook(book) if isinstance(book, str) else book
+        # Exact play when both players have no walls left (EndgameSolver)
+        self.endgame = EndgameSolver() if endgame else None
+        # With workers > 1 walls are rated in a process pool, which is kept for the next moves
+        self.workers = workers
+        self.executor = None
+        # Optional table of evaluated positions (TranspositionTable), it can be shared between games
+        self.tt = transposition_table
+
+        # Rate only walls next to a shortest path of any player or near pawns (see relevant_walls).
+        # With compare_pruning all walls are rated and moves where pruning changes the result are counted.
+        self.pruning = pruning
+        self.pruning_radius = pruning_radius
+        self.compare_pruning = compare_pruning
+        self.pruning_stats = {"moves": 0, "walls": 0, "rated_walls": 0, "mismatches": 0}
+
+    def close(self):
+        """Stop worker processes."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def rate_walls(self, game, board, pawns_loc, player, walls):
+        """Return [(wall, delta)] where delta is self distance minus opponent distance after the wall."""
+        opponent = 2 if player == 1 else 1
+        self_i, self_j = pawns_loc[player]
+        oppo_i, oppo_j = pawns_loc[opponent]
+        flat_maps = self.map_dists(game, board, flat=True)
+        walls_key = game.walls_key(board)
+        deltas = []
+        for (i, j), orientation in walls:
+            game.apply_wall(board, (i, j), orientation)
+            new_walls_key = game.add_wall_to_key(walls_key, (i, j), orientation)
+            maps = self.map_dists_after_wall(game, board, flat_maps, new_walls_key, (i, j), orientation)
+            game.undo_wall(board, (i, j), orientation)
+            delta = maps[player][self_i * game.width + self_j] - maps[opponent][oppo_i * game.width + oppo_j]
+            deltas.append((((i, j), orientation), delta))
+        return deltas
+
+    def rate_walls_parallel(self, game, player, rated_walls):
+        """The same as rate_walls, but the walls are split between worker processes."""
+        if not rated_walls:
+            return []
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers)
+
+        # Workers get a compact state of the position instead of the board
+        state = game.get_state(player)
+        settings = (game.height, game.width, game.walls_number, game.backend)
+        chunk = -(-len(rated_walls) // self.workers)
+        tasks = [(settings, state, player, rated_walls[n:n + chunk]) for n in range(0, len(rated_walls), chunk)]
+        deltas = []
+        for result in self.executor.map(rate_walls_worker, tasks):
+            deltas += result
+        return deltas
+
+    def relevant_walls(self, game, board, pawns_loc, walls):
+        """
+        Return walls which touch a cell of a shortest path of any player
+        or lie within pruning_radius cells from any pawn.
+        """
+        path_cells = set()
+        for path_player, loc in pawns_loc.items():
+            path_cells.update(game.shortest_path(board, path_player, loc) or [])
+        relevant = set()
+        for wall in walls:
+            (i, j), orientation = wall
+            if (i, j) in path_cells or (i + 1, j) in path_cells \
+                    or (i, j + 1) in path_cells or (i + 1, j + 1) in path_cells:
+                relevant.add(wall)
+                continue
+            # Distance from a pawn to the center of the wall
+            for pawn_i, pawn_j in pawns_loc.values():
+                if max(abs(pawn_i - i - 0.5), abs(pawn_j - j - 0.5)) <= self.pruning_radius:
+                    relevant.add(wall)
+                    break
+        return relevant
+
+    def move(self, game, player):
         """Return object to be moved and its coordinates."""
+        board, pawns_loc, walls = game.board, game.pawns_loc, game.walls
         # print(*board, sep="\n")
-        from runner import game
+        if self.book is not None:
+            move = self.book.move(game, player)
+            if move is not None:
+                return move
         if player == 1:
             opponent = 2
         else:
             opponent = 1
+
+        walls_left = {wall_player: game.walls_left(wall_player) for wall_player in walls}
+        if self.endgame is not None:
+            move = self.endgame.move(game, board, pawns_loc, walls_left, player)
+            if move is not None:
+                return move
+
+        # Reuse a move found for this position earlier
+        key = None
+        if self.tt is not None:
+            if player == game.player(game.turn):
+                key = game.key
+            else:
+                key = game.position_key(board, pawns_loc, walls_left, player)
+            entry = self.tt.probe(key)
+            if entry is not None and entry[3] is not None:
+                return entry[3]
+
         self_i, self_j = pawns_loc[player]
         oppo_i, oppo_j = pawns_loc[opponent]
         rated_moves = []
         available_moves = game.available_moves(board, pawns_loc[player])
-        self_distances = self.map_dist(board, player)
-        oppo_distances = self.map_dist(board, opponent)
+        maps = self.map_dists(game, board)
+        self_distances = maps[player]
+        oppo_distances = maps[opponent]
 
         available_moves.sort(key=lambda cell: self_distances[cell[0]][cell[1]])
         i, j = available_moves[0]
@@ -89,24 +315,28 @@ class PrimitiveAI(TestAI):
 
         if not all(wall["placed"] for wall in walls[player]):
             available_walls = game.available_walls(board, pawns_loc, player)
-            for wall in available_walls:
-                i, j = wall["loc"]
-                orientation = wall["orientation"]
-                state = copy.deepcopy(board)
-                state[i][j]["wall_origin"] = True
-                state[i][j]["orientation"] = orientation
-                if orientation == "horizontal":
-                    state[i][j]["wall_down"] = True
-                    state[i][j + 1]["wall_down"] = True
-                else:
-                    state[i][j]["wall_right"] = True
-                    state[i + 1][j]["wall_right"] = True
-                self_dist = self.map_dist(state, player)
-                opp_dist = self.map_dist(state, opponent)
-                delta = self_dist[self_i][self_j] - opp_dist[oppo_i][oppo_j]
+            rated_walls = available_walls
+            if self.pruning or self.compare_pruning:
+                relevant = self.relevant_walls(game, board, pawns_loc, available_walls)
+                if not self.compare_pruning:
+                    rated_walls = relevant
+            if self.workers > 1:
+                deltas = self.rate_walls_parallel(game, player, sorted(rated_walls))
+            else:
+                deltas = self.rate_walls(game, board, pawns_loc, player, sorted(rated_walls))
+            pruned_min_delta = min_delta
+            for ((i, j), orientation), delta in deltas:
                 rated_moves.append(("wall", (i, j), orientation, delta))
                 if delta < min_delta:
                     min_delta = delta
+                if self.compare_pruning and ((i, j), orientation) in relevant and delta < pruned_min_delta:
+                    pruned_min_delta = delta
+
+            self.pruning_stats["moves"] += 1
+            self.pruning_stats["walls"] += len(available_walls)
+            self.pruning_stats["rated_walls"] += len(relevant) if self.pruning else len(rated_walls)
+            if self.compare_pruning and pruned_min_delta != min_delta:
+                self.pruning_stats["mismatches"] += 1
 
         # print('min_delta (self distance - opponent distance): ', min_delta)
         best_moves = [move for move in rated_moves if move[-1] == min_delta]
@@ -114,6 +344,491 @@ class PrimitiveAI(TestAI):
         item = best_move[0]
         i, j = best_move[1]
         orientation = best_move[2]
+        if self.tt is not None:
+            # Only the move is stored: a rating is not a search value, so the entry (depth 0, no bound)
+            # never cuts off a search which shares the table
+            self.tt.store(key, 0, None, None, (item, orientation, i, j))
 
-        # print(*self.map_dist(board, player), sep="\n", end="\n")
+        # print(*self.map_dist(game, board, player), sep="\n", end="\n")
         return item, orientation, i, j
+
+
+class MoveOrdering:
+    """
+    Order of walls for alpha-beta search: walls cutting the opponent's shortest path first,
+    then killer moves of the ply, then walls with a better history.
+    The history table persists across turns (it is halved for every new search) until clear is called.
+    """
+
+    def __init__(self, killers_per_ply=2):
+        self.killers_per_ply = killers_per_ply
+        self.killers = {}  # ply: moves which caused a cutoff
+        self.history = {}  # move: sum of depth * depth of cutoffs
+
+    def clear(self):
+        """Forget everything (for a new game)."""
+        self.killers.clear()
+        self.history.clear()
+
+    def new_search(self):
+        """Forget killers of the previous search and age the history."""
+        self.killers.clear()
+        for move in list(self.history):
+            self.history[move] //= 2
+            if not self.history[move]:
+                del self.history[move]
+
+    def order_walls(self, game, board, pawns_loc, player, walls, ply):
+        """Return wall moves (item, orientation, i, j) sorted from the most promising."""
+        opponent = 2 if player == 1 else 1
+        cutting = game.cutting_walls(game.shortest_path(board, opponent, pawns_loc[opponent]) or [])
+        killers = self.killers.get(ply, [])
+        history = self.history
+
+        def rating(move):
+            item, orientation, i, j = move
+            return ((i, j), orientation) not in cutting, move not in killers, -history.get(move, 0)
+
+        return sorted(walls, key=rating)
+
+    def cutoff(self, move, depth, ply):
+        """Remember a move which caused a beta cutoff."""
+        killers = self.killers.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[self.killers_per_ply:]
+        self.history[move] = self.history.get(move, 0) + depth * depth
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget is over."""
+
+
+class SearchAI(TestAI):
+    """
+    Negamax alpha-beta search with iterative deepening and a transposition table.
+    A position is rated by the difference of distances to the finish line and of unused walls.
+    When the time budget is over the best move of the last finished depth is returned.
+    """
+
+    def __init__(self, time_limit=0.05, max_depth=20, cache_size=4096, transposition_table=None, endgame=True,
+                 book=None):
+        super().__init__(cache_size)
+        # Optional opening book (OpeningBook or a path of a book file)
+        self.book = OpeningBook(book) if isinstance(book, str) else book
+        # Exact play when both players have no walls left (EndgameSolver)
+        self.endgame = EndgameSolver() if endgame else None
+        self.time_limit = time_limit  # seconds per move
+        self.max_depth = max_depth
+        self.tt = transposition_table if transposition_table is not None else TranspositionTable()
+        self.ordering = MoveOrdering()
+        # Statistics of the last move: finished depth, visited nodes and spent time
+        self.last_stats = {}
+
+    def move(self, game, player):
+        """Return object to be moved and its coordinates."""
+        if self.book is not None:
+            move = self.book.move(game, player)
+            if move is not None:
+                return move
+        return self.search(game, game.board, game.pawns_loc, game.walls, player)
+
+    def search(self, game, board, pawns_loc, walls, player):
+        """Run iterative deepening until the time budget or max_depth is reached and return the best move."""
+        start = time.perf_counter()
+        walls_left = {wall_player: game.walls_left(wall_player) for wall_player in walls}
+        if self.endgame is not None:
+            move = self.endgame.move(game, board, pawns_loc, walls_left, player)
+            if move is not None:
+                self.last_stats = {"depth": 0, "nodes": 0, "time": time.perf_counter() - start, "endgame": True}
+                return move
+        self.deadline = start + self.time_limit
+        self.nodes = 0
+        self.tt.new_search()
+        self.ordering.new_search()
+
+        # Candidate walls are carried through the search (the copied board would miss the game's cached set)
+        candidate_walls = game.available_walls(board, pawns_loc, player)
+
+        # The search works on its own copy of the position
+        board = copy.deepcopy(board)
+        pawns_loc = dict(pawns_loc)
+        key = game.position_key(board, pawns_loc, walls_left, player)
+        walls_key = game.walls_key(board)
+        maps = self.map_dists(game, board, flat=True)
+
+        # A move for the case when even the first depth is not finished in time
+        distances = maps[player]
+        moves = game.available_moves(board, pawns_loc[player])
+        i, j = min(moves, key=lambda cell: distances[cell[0] * game.width + cell[1]])
+        best_move = ("pawn", None, i, j)
+        depth_done = 0
+
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score, move = self.negamax(game, board, pawns_loc, walls_left, player, key, walls_key, maps,
+                                           candidate_walls, depth, -WIN_SCORE - 1, WIN_SCORE + 1, 0)
+            except SearchTimeout:
+                break
+            if move is not None:
+                best_move = move
+            depth_done = depth
+            # Stop when the result is a forced win or loss
+            if abs(score) >= WIN_SCORE - self.max_depth:
+                break
+
+        self.last_stats = {
+            "depth": depth_done,
+            "nodes": self.nodes,
+            "time": time.perf_counter() - start
+        }
+        return best_move
+
+    def evaluate(self, game, pawns_loc, walls_left, player, maps):
+        """Rate a position for the player who has the next turn."""
+        opponent = 2 if player == 1 else 1
+        self_i, self_j = pawns_loc[player]
+        oppo_i, oppo_j = pawns_loc[opponent]
+        self_dist = maps[player][self_i * game.width + self_j]
+        oppo_dist = maps[opponent][oppo_i * game.width + oppo_j]
+        return (oppo_dist - self_dist) * 10 + walls_left[player] - walls_left[opponent]
+
+    def ordered_moves(self, game, board, pawns_loc, walls_left, player, maps, walls, tt_move, ply):
+        """
+        Return moves to search: the move from the transposition table, pawn moves (closest first),
+        walls in the order of MoveOrdering.
+        """
+        distances = maps[player]
+        moves = [("pawn", None, i, j) for i, j in game.available_moves(board, pawns_loc[player])]
+        moves.sort(key=lambda move: distances[move[2] * game.width + move[3]])
+        if walls_left[player]:
+            wall_moves = [("wall", orientation, i, j) for (i, j), orientation in walls]
+            moves += self.ordering.order_walls(game, board, pawns_loc, player, wall_moves, ply)
+        if tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        return moves
+
+    def negamax(self, game, board, pawns_loc, walls_left, player, key, walls_key, maps, walls,
+                depth, alpha, beta, ply):
+        """
+        Return a score of the position for the player who has the next turn and the best move.
+        walls is a set of candidate walls: walls which were legal in the parent position and do not cross
+        placed walls. It is updated incrementally, a candidate which blocks a player is skipped when it is tried.
+        """
+        self.nodes += 1
+        if time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+        opponent = 2 if player == 1 else 1
+        if game.won(opponent, pawns_loc):
+            return -(WIN_SCORE - ply), None
+        if depth == 0:
+            return self.evaluate(game, pawns_loc, walls_left, player, maps), None
+
+        # Use a stored result of the same position
+        alpha_orig = alpha
+        entry = self.tt.probe(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, value, flag, tt_move = entry
+            value = self.tt.cutoff((entry_depth, score_from_tt(value, ply), flag, tt_move), depth, alpha, beta)
+            if value is not None and ply > 0:
+                return value, tt_move
+
+        best_score = -WIN_SCORE - 1
+        best_move = None
+        unreachable = game.height * game.width
+        for move in self.ordered_moves(game, board, pawns_loc, walls_left, player, maps, walls, tt_move, ply):
+            item, orientation, i, j = move
+            if item == "pawn":
+                prev_loc = game.apply_pawn_move(board, pawns_loc, player, (i, j))
+                # The candidate walls are kept: walls cut off by the move are rejected by the maps below,
+                # the few walls which only the move made legal are not searched
+                score = -self.negamax(game, board, pawns_loc, walls_left, opponent,
+                                      game.key_after_pawn_move(key, player, prev_loc, (i, j)), walls_key, maps,
+                                      walls, depth - 1, -beta, -alpha, ply + 1)[0]
+                game.undo_pawn_move(board, pawns_loc, player, prev_loc)
+            else:
+                game.apply_wall(board, (i, j), orientation)
+                new_walls_key = game.add_wall_to_key(walls_key, (i, j), orientation)
+                new_maps = self.map_dists_after_wall(game, board, maps, new_walls_key, (i, j), orientation)
+                # A wall is legal if both pawns can still reach their sides (the maps are needed anyway)
+                if any(new_maps[pawn][pawn_i * game.width + pawn_j] == unreachable
+                       for pawn, (pawn_i, pawn_j) in pawns_loc.items()):
+                    game.undo_wall(board, (i, j), orientation)
+                    continue
+                new_key = game.key_after_wall(key, player, (i, j), orientation, walls_left[player])
+                new_walls = walls - game.overlapping_walls((i, j), orientation)
+                walls_left[player] -= 1
+                score = -self.negamax(game, board, pawns_loc, walls_left, opponent, new_key, new_walls_key, new_maps,
+                                      new_walls, depth - 1, -beta, -alpha, ply + 1)[0]
+                walls_left[player] += 1
+                game.undo_wall(board, (i, j), orientation)
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                # Only walls are ordered by killers and history
+                if item == "wall" and move != tt_move:
+                    self.ordering.cutoff(move, depth, ply)
+                break
+
+        if best_score <= alpha_orig:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.store(key, depth, score_to_tt(best_score, ply), flag, best_move)
+        return best_score, best_move
+
+
+class MCTSNode:
+    """A node of the Monte Carlo search tree. Wins are counted for the player who made the move into the node."""
+
+    __slots__ = ("move", "parent", "player", "children", "untried", "visits", "wins")
+
+    def __init__(self, move, parent, player):
+        self.move = move
+        self.parent = parent
+        self.player = player
+        self.children = []
+        self.untried = None  # moves which are not expanded yet (computed on the first visit)
+        self.visits = 0
+        self.wins = 0
+
+
+def grow_tree_worker(task):
+    """Grow an independent MCTS tree in a worker process (root parallelism) and return its root statistics."""
+    settings, state, options, seed = task
+    height, width, walls_number, backend = settings
+    game = Quoridor(height=height, width=width, walls_number=walls_number, backend=backend)
+    game.set_state(state)
+    ai = MCTSAI(workers=1, **options)
+    player = game.player(game.turn)
+    walls_left = {wall_player: game.walls_left(wall_player) for wall_player in game.walls}
+    return ai.grow_tree(game, game.board, game.pawns_loc, walls_left, player, random.Random(seed))
+
+
+class MCTSAI(TestAI):
+    """
+    Monte Carlo Tree Search with UCT selection.
+    Playouts are random or distance-guided (pawns mostly step along the shortest path).
+    With workers > 1 independent trees are grown in a process pool and merged by visit counts.
+    """
+
+    def __init__(self, time_limit=0.5, iterations=None, workers=1, playout="distance", exploration=1.4,
+                 epsilon=0.2, wall_rate=0.1, playout_depth=200, cache_size=4096):
+        super().__init__(cache_size)
+        if playout not in ("distance", "random"):
+            raise ValueError(f"Unknown playout policy: {playout}")
+        self.time_limit = time_limit  # seconds per move
+        self.iterations = iterations  # optional limit of playouts per tree
+        self.workers = workers
+        self.playout = playout
+        self.exploration = exploration
+        self.epsilon = epsilon  # chance of a random pawn move in distance-guided playouts
+        self.wall_rate = wall_rate  # chance to try a random wall in a playout
+        self.playout_depth = playout_depth
+        self.pool = None
+        # Statistics of the last move: playouts, playouts per second and tree size
+        self.last_stats = {}
+
+    def close(self):
+        """Stop worker processes."""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def move(self, game, player):
+        """Return object to be moved and its coordinates."""
+        board, pawns_loc, walls = game.board, game.pawns_loc, game.walls
+        start = time.perf_counter()
+        walls_left = {wall_player: game.walls_left(wall_player) for wall_player in walls}
+
+        if self.workers > 1:
+            # Workers get a compact state of the position and rebuild the game
+            state = game.get_state(player)
+            settings = (game.height, game.width, game.walls_number, game.backend)
+            options = {"time_limit": self.time_limit, "iterations": self.iterations, "playout": self.playout,
+                       "exploration": self.exploration, "epsilon": self.epsilon, "wall_rate": self.wall_rate,
+                       "playout_depth": self.playout_depth}
+            if self.pool is None:
+                self.pool = multiprocessing.Pool(self.workers)
+            tasks = [(settings, state, options, random.getrandbits(32)) for _ in range(self.workers)]
+            results = self.pool.map(grow_tree_worker, tasks)
+        else:
+            results = [self.grow_tree(game, copy.deepcopy(board), dict(pawns_loc), walls_left, player,
+                                      random.Random(random.getrandbits(32)))]
+
+        # Merge root statistics of all trees
+        visits = {}
+        for moves, playouts, tree_size in results:
+            for move, (move_visits, move_wins) in moves.items():
+                total_visits, total_wins = visits.get(move, (0, 0))
+                visits[move] = (total_visits + move_visits, total_wins + move_wins)
+        playouts = sum(result[1] for result in results)
+        elapsed = time.perf_counter() - start
+        self.last_stats = {
+            "playouts": playouts,
+            "playouts_per_second": playouts / elapsed if elapsed else 0.0,
+            "tree_size": sum(result[2] for result in results),
+            "workers": len(results),
+            "time": elapsed
+        }
+
+        if not visits:
+            i, j = game.available_moves(board, pawns_loc[player])[0]
+            return "pawn", None, i, j
+        return max(visits, key=lambda move: visits[move])
+
+    def grow_tree(self, game, board, pawns_loc, walls_left, player, rng):
+        """
+        Run MCTS iterations on the position (board, pawns_loc and walls_left are changed and restored).
+        Return ({move: (visits, wins)} for root moves, number of playouts, number of nodes).
+        """
+        deadline = time.perf_counter() + self.time_limit
+        opponent = 2 if player == 1 else 1
+        root = MCTSNode(None, None, opponent)
+        tree_size = 1
+        playouts = 0
+
+        while time.perf_counter() < deadline and (self.iterations is None or playouts < self.iterations):
+            node = root
+            to_move = player
+            played = []
+
+            # Selection
+            while node.untried is not None and not node.untried and node.children:
+                node = self.select(node)
+                played.append((to_move, node.move, self.play(game, board, pawns_loc, walls_left, to_move, node.move)))
+                to_move = 2 if to_move == 1 else 1
+
+            # Expansion
+            if game.won(node.player, pawns_loc):
+                winner = node.player
+            else:
+                if node.untried is None:
+                    node.untried = self.legal_moves(game, board, pawns_loc, walls_left, to_move)
+                    rng.shuffle(node.untried)
+                if node.untried:
+                    move = node.untried.pop()
+                    child = MCTSNode(move, node, to_move)
+                    node.children.append(child)
+                    tree_size += 1
+                    node = child
+                    played.append((to_move, move, self.play(game, board, pawns_loc, walls_left, to_move, move)))
+                    to_move = 2 if to_move == 1 else 1
+
+                # Simulation
+                if game.won(node.player, pawns_loc):
+                    winner = node.player
+                else:
+                    winner = self.simulate(game, board, pawns_loc, walls_left, to_move, rng)
+            playouts += 1
+
+            # Backpropagation
+            while node is not None:
+                node.visits += 1
+                if node.player == winner:
+                    node.wins += 1
+                node = node.parent
+
+            for to_move, move, undo in reversed(played):
+                self.unplay(game, board, pawns_loc, walls_left, to_move, move, undo)
+
+        moves = {child.move: (child.visits, child.wins) for child in root.children}
+        return moves, playouts, tree_size
+
+    def select(self, node):
+        """Return a child with the best UCT value."""
+        log_visits = math.log(node.visits)
+        return max(node.children, key=lambda child: child.wins / child.visits
+                   + self.exploration * math.sqrt(log_visits / child.visits))
+
+    def legal_moves(self, game, board, pawns_loc, walls_left, player):
+        """
+        Return moves of the player: pawn moves and walls.
+        Only walls which cut the opponent's shortest path are considered, other walls do not slow the opponent down.
+        """
+        moves = [("pawn", None, i, j) for i, j in game.available_moves(board, pawns_loc[player])]
+        if walls_left[player]:
+            opponent = 2 if player == 1 else 1
+            path = game.shortest_path(board, opponent, pawns_loc[opponent]) or []
+            candidates = game.cutting_walls(path) & game.free_walls(board)
+            moves += [("wall", orientation, i, j)
+                      for (i, j), orientation in sorted(game.filter_walls(board, pawns_loc, candidates))]
+        return moves
+
+    def play(self, game, board, pawns_loc, walls_left, player, move):
+        """Make a move on the board and return data for unplay."""
+        item, orientation, i, j = move
+        if item == "pawn":
+            return game.apply_pawn_move(board, pawns_loc, player, (i, j))
+        game.apply_wall(board, (i, j), orientation)
+        walls_left[player] -= 1
+        return None
+
+    def unplay(self, game, board, pawns_loc, walls_left, player, move, undo):
+        """Take back a move made by play."""
+        item, orientation, i, j = move
+        if item == "pawn":
+            game.undo_pawn_move(board, pawns_loc, player, undo)
+        else:
+            game.undo_wall(board, (i, j), orientation)
+            walls_left[player] += 1
+
+    def simulate(self, game, board, pawns_loc, walls_left, player, rng):
+        """Play the game to the end with the playout policy and return the winner (the board is restored)."""
+        played = []
+        maps = self.map_dists(game, board, flat=True)
+        winner = None
+        for step in range(self.playout_depth):
+            opponent = 2 if player == 1 else 1
+            if game.won(opponent, pawns_loc):
+                winner = opponent
+                break
+            move = None
+
+            # Sometimes try a random wall
+            if walls_left[player] and rng.random() < self.wall_rate:
+                (i, j), orientation = rng.choice(sorted(game.free_walls(board)) or [((None, None), None)])
+                if orientation is not None:
+                    game.apply_wall(board, (i, j), orientation)
+                    if game.path_finder(board, 1, pawns_loc) and game.path_finder(board, 2, pawns_loc):
+                        walls_left[player] -= 1
+                        move = ("wall", orientation, i, j)
+                        played.append((player, move, None))
+                        maps = self.map_dists(game, board, flat=True)
+                    else:
+                        game.undo_wall(board, (i, j), orientation)
+
+            if move is None:
+                cells = game.available_moves(board, pawns_loc[player])
+                if self.playout == "distance" and rng.random() >= self.epsilon:
+                    distances = maps[player]
+                    i, j = min(cells, key=lambda cell: distances[cell[0] * game.width + cell[1]])
+                else:
+                    i, j = rng.choice(cells)
+                move = ("pawn", None, i, j)
+                played.append((player, move, game.apply_pawn_move(board, pawns_loc, player, (i, j))))
+            player = opponent
+
+        if winner is None:
+            # Unfinished playout: the player closer to the finish line wins (ties go to the player to move)
+            opponent = 2 if player == 1 else 1
+            self_i, self_j = pawns_loc[player]
+            oppo_i, oppo_j = pawns_loc[opponent]
+            if maps[player][self_i * game.width + self_j] <= maps[opponent][oppo_i * game.width + oppo_j]:
+                winner = player
+            else:
+                winner = opponent
+
+        for to_move, move, undo in reversed(played):
+            self.unplay(game, board, pawns_loc, walls_left, to_move, move, undo)
+        return winner
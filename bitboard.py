@@ -0,0 +1,431 @@
+import functools
+
+
+@functools.lru_cache(maxsize=None)
+def geometry(height, width):
+    """
+    Return masks which depend only on the board size:
+    all cells, first column, last column, last row and every row.
+    """
+    full = (1 << height * width) - 1
+    row = (1 << width) - 1
+    rows = tuple(row << i * width for i in range(height))
+    first_col = 0
+    for i in range(height):
+        first_col |= 1 << i * width
+    last_col = first_col << width - 1
+    return full, first_col, last_col, rows[-1], rows
+
+
+class BitBoard:
+    """
+    Compact board representation.
+    Cell (i, j) is the bit i * width + j. Walls are stored as bitmasks of blocked edges:
+    wall_down - an edge between (i, j) and (i + 1, j), wall_right - between (i, j) and (i, j + 1).
+    Indexing (board[i][j]["player"]) gives the same dict view as the list-of-dicts board.
+    """
+
+    __slots__ = ("height", "width", "pawns", "wall_down", "wall_right", "wall_origin", "vertical")
+
+    def __init__(self, height, width):
+        self.height = height
+        self.width = width
+        self.pawns = {}  # player: cell index
+        self.wall_down = 0
+        self.wall_right = 0
+        self.wall_origin = 0
+        self.vertical = 0  # walls with origin in a cell that are vertical
+
+    def copy(self):
+        """Return a copy of the board (only a few integers are copied)."""
+        board = BitBoard.__new__(BitBoard)
+        board.height = self.height
+        board.width = self.width
+        board.pawns = self.pawns.copy()
+        board.wall_down = self.wall_down
+        board.wall_right = self.wall_right
+        board.wall_origin = self.wall_origin
+        board.vertical = self.vertical
+        return board
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    # Dict view
+
+    def __len__(self):
+        return self.height
+
+    def __iter__(self):
+        for i in range(self.height):
+            yield _Row(self, i)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.height
+        if not 0 <= i < self.height:
+            raise IndexError("board row index out of range")
+        return _Row(self, i)
+
+    # Cells
+
+    def index(self, loc):
+        """Return a bit number of the cell."""
+        return loc[0] * self.width + loc[1]
+
+    def occupied(self):
+        """Return a mask of cells with pawns."""
+        mask = 0
+        for k in self.pawns.values():
+            mask |= 1 << k
+        return mask
+
+    def player_at(self, i, j):
+        """Return a player whose pawn is on the cell or 0."""
+        k = i * self.width + j
+        for player, pawn in self.pawns.items():
+            if pawn == k:
+                return player
+        return 0
+
+    def set_player(self, i, j, player):
+        """Put a pawn of the player on the cell (player=0 removes any pawn from the cell)."""
+        k = i * self.width + j
+        if player == 0:
+            for pawn_player, pawn in list(self.pawns.items()):
+                if pawn == k:
+                    del self.pawns[pawn_player]
+        else:
+            self.pawns[player] = k
+
+    def goal_mask(self, player):
+        """Return a mask of cells where the player wins."""
+        full, first_col, last_col, last_row, rows = geometry(self.height, self.width)
+        if player == 1:
+            return rows[0]
+        elif player == 2:
+            return last_row
+        elif player == 3:
+            return last_col
+        return first_col
+
+    def apply_wall(self, loc, orientation):
+        """Place a wall (without any checks)."""
+        k = loc[0] * self.width + loc[1]
+        self.wall_origin |= 1 << k
+        if orientation == "horizontal":
+            self.wall_down |= 1 << k | 1 << k + 1
+        else:
+            self.wall_right |= 1 << k | 1 << k + self.width
+            self.vertical |= 1 << k
+
+    def undo_wall(self, loc, orientation):
+        """Remove a wall placed by apply_wall."""
+        k = loc[0] * self.width + loc[1]
+        self.wall_origin &= ~(1 << k)
+        self.vertical &= ~(1 << k)
+        if orientation == "horizontal":
+            self.wall_down &= ~(1 << k | 1 << k + 1)
+        else:
+            self.wall_right &= ~(1 << k | 1 << k + self.width)
+
+    # Rules
+
+    def is_barrier(self, loc_a, loc_b):
+        """Check if there is a barrier between two neighboring cells."""
+        i, j = loc_a[0], loc_a[1]
+        fin_i, fin_j = loc_b[0], loc_b[1]
+        d_i, d_j = i - fin_i, j - fin_j
+        if d_i == -1:
+            return bool(self.wall_down >> (i * self.width + j) & 1)
+        elif d_i == 1:
+            return bool(self.wall_down >> (fin_i * self.width + fin_j) & 1)
+        elif d_j == -1:
+            return bool(self.wall_right >> (i * self.width + j) & 1)
+        elif d_j == 1:
+            return bool(self.wall_right >> (fin_i * self.width + fin_j) & 1)
+        return False
+
+    def available_moves(self, loc, planning=False):
+        """
+        Return a list with cells where a pawn can move (the same rules as Quoridor.available_moves).
+        When planning=True a cells with pawns counts as empty (available for moving).
+        """
+        available_moves = []
+        height, width = self.height, self.width
+        occupied = self.occupied()
+        barrier = self.is_barrier
+        pawn_i, pawn_j = loc[0], loc[1]
+
+        main_moves = [(pawn_i - 1, pawn_j),
+                      (pawn_i + 1, pawn_j),
+                      (pawn_i, pawn_j - 1),
+                      (pawn_i, pawn_j + 1)]
+
+        for i, j in main_moves:
+            if 0 <= i < height and 0 <= j < width:
+                taken = occupied >> (i * width + j) & 1
+
+                # Add main moves
+                if not taken or planning is True:
+                    if not barrier((pawn_i, pawn_j), (i, j)):
+                        available_moves.append((i, j))
+
+                # Add double moves (jump over other pawn)
+                if taken:
+                    new_i = i + (i - pawn_i)
+                    new_j = j + (j - pawn_j)
+                    if 0 <= new_i < height and 0 <= new_j < width:
+                        if not barrier((pawn_i, pawn_j), (i, j)):
+                            if not barrier((i, j), (new_i, new_j)):
+                                if not occupied >> (new_i * width + new_j) & 1:
+                                    available_moves.append((new_i, new_j))
+
+                    # Add double side moves
+                    if not barrier((pawn_i, pawn_j), (i, j)):
+                        board_edge = new_j == -1 or new_j == width or new_i == -1 or new_i == height
+                        if board_edge or barrier((i, j), (new_i, new_j)):
+                            if new_i == i:
+                                for side_i in [i - 1, i + 1]:
+                                    if 0 <= side_i < height:
+                                        if not occupied >> (side_i * width + j) & 1:
+                                            if not barrier((i, j), (side_i, j)):
+                                                available_moves.append((side_i, j))
+                            if new_j == j:
+                                for side_j in [j - 1, j + 1]:
+                                    if 0 <= side_j < width:
+                                        if not occupied >> (i * width + side_j) & 1:
+                                            if not barrier((i, j), (i, side_j)):
+                                                available_moves.append((i, side_j))
+        return available_moves
+
+    def expand(self, cells):
+        """Return cells mask extended by one orthogonal step (walls are respected, pawns are not)."""
+        full, first_col, last_col, last_row, rows = geometry(self.height, self.width)
+        width = self.width
+        down = self.wall_down
+        right = self.wall_right
+        return (cells
+                | (cells >> width) & ~down
+                | (cells & ~down) << width & full
+                | (cells & ~right & ~last_col) << 1
+                | (cells & ~first_col) >> 1 & ~right)
+
+    def neighbours(self, loc):
+        """Return cells next to the cell which are not separated from it by walls."""
+        cells = self.expand(1 << self.index(loc)) & ~(1 << self.index(loc))
+        neighbours = []
+        while cells:
+            k = (cells & -cells).bit_length() - 1
+            neighbours.append(divmod(k, self.width))
+            cells &= cells - 1
+        return neighbours
+
+    def reachable(self, start, goal):
+        """Check if any cell of the goal mask is reachable from the start mask (flood fill)."""
+        cells = start
+        while not cells & goal:
+            new_cells = self.expand(cells)
+            if new_cells == cells:
+                return False
+            cells = new_cells
+        return True
+
+    def path_finder(self, player, pawns_loc):
+        """Return True if path to other side of the board is clear (and victory is available)."""
+        return self.reachable(1 << self.index(pawns_loc[player]), self.goal_mask(player))
+
+    def distance_map(self, goal, max_value):
+        """Return a list with numbers of steps from every cell to the goal mask (max_value if there is no path)."""
+        distances = [max_value] * (self.height * self.width)
+        cells = layer = goal
+        dist = 0
+        while layer:
+            while layer:
+                k = (layer & -layer).bit_length() - 1
+                distances[k] = dist
+                layer &= layer - 1
+            new_cells = self.expand(cells)
+            layer = new_cells & ~cells
+            cells = new_cells
+            dist += 1
+        return distances
+
+    def shortest_path(self, start, goal):
+        """Return a list of cell indices of a shortest path from the start cell to the goal mask or None."""
+        cells = 1 << start
+        layers = [cells]
+        while not cells & goal:
+            new_cells = self.expand(cells)
+            if new_cells == cells:
+                return None
+            layers.append(new_cells & ~cells)
+            cells = new_cells
+
+        # Go back from the reached goal cell through the layers
+        last = layers[-1] & goal
+        k = (last & -last).bit_length() - 1
+        path = [k]
+        for layer in reversed(layers[:-1]):
+            previous = self.expand(1 << k) & layer
+            k = (previous & -previous).bit_length() - 1
+            path.append(k)
+        path.reverse()
+        return path
+
+    def path_edges(self, path):
+        """Return masks of down and right edges which the path (cell indices) crosses."""
+        down = right = 0
+        for a, b in zip(path, path[1:]):
+            if a > b:
+                a, b = b, a
+            if b - a == self.width:
+                down |= 1 << a
+            else:
+                right |= 1 << a
+        return down, right
+
+    def free_walls(self):
+        """Return a set of walls (loc, orientation) which do not overlap or cross placed walls."""
+        free_walls = set()
+        width = self.width
+        down, right, origin = self.wall_down, self.wall_right, self.wall_origin
+        for i in range(self.height - 1):
+            for j in range(width - 1):
+                k = i * width + j
+                if origin >> k & 1:
+                    continue
+                if not down & (1 << k | 1 << k + 1):
+                    free_walls.add(((i, j), "horizontal"))
+                if not right & (1 << k | 1 << k + width):
+                    free_walls.add(((i, j), "vertical"))
+        return free_walls
+
+    def filter_walls(self, pawns_loc, walls):
+        """
+        Return a set of walls from the given free walls which leave a path for every player.
+        Only walls which cut a current shortest path of a player need a reachability check.
+        """
+        legal_walls = set()
+        width = self.width
+        down, right = self.wall_down, self.wall_right
+        starts = {player: 1 << self.index(loc) for player, loc in pawns_loc.items()}
+        goals = {player: self.goal_mask(player) for player in pawns_loc}
+
+        # Edges of the shortest paths (-1 means that every wall has to be checked)
+        cut_down = cut_right = 0
+        for player, loc in pawns_loc.items():
+            path = self.shortest_path(self.index(loc), goals[player])
+            if path is None:
+                cut_down = cut_right = -1
+                break
+            path_down, path_right = self.path_edges(path)
+            cut_down |= path_down
+            cut_right |= path_right
+
+        for wall in walls:
+            (i, j), orientation = wall
+            k = i * width + j
+            if orientation == "horizontal":
+                edges = 1 << k | 1 << k + 1
+                if not cut_down & edges:
+                    legal_walls.add(wall)
+                    continue
+                self.wall_down = down | edges
+            else:
+                edges = 1 << k | 1 << k + width
+                if not cut_right & edges:
+                    legal_walls.add(wall)
+                    continue
+                self.wall_right = right | edges
+            if all(self.reachable(starts[player], goals[player]) for player in starts):
+                legal_walls.add(wall)
+            self.wall_down, self.wall_right = down, right
+        return legal_walls
+
+
+class _Row:
+    """A row of the dict view of BitBoard."""
+
+    __slots__ = ("board", "i")
+
+    def __init__(self, board, i):
+        self.board = board
+        self.i = i
+
+    def __len__(self):
+        return self.board.width
+
+    def __iter__(self):
+        for j in range(self.board.width):
+            yield _Cell(self.board, self.i, j)
+
+    def __getitem__(self, j):
+        if j < 0:
+            j += self.board.width
+        if not 0 <= j < self.board.width:
+            raise IndexError("board column index out of range")
+        return _Cell(self.board, self.i, j)
+
+
+class _Cell:
+    """A cell of the dict view of BitBoard. Supports the same keys as a cell dict."""
+
+    __slots__ = ("board", "i", "j")
+
+    _flags = ("wall_origin", "wall_down", "wall_right")
+
+    def __init__(self, board, i, j):
+        self.board = board
+        self.i = i
+        self.j = j
+
+    def __getitem__(self, key):
+        board = self.board
+        k = self.i * board.width + self.j
+        if key == "player":
+            return board.player_at(self.i, self.j)
+        if key in self._flags:
+            return bool(getattr(board, key) >> k & 1)
+        if key == "orientation" and board.wall_origin >> k & 1:
+            return "vertical" if board.vertical >> k & 1 else "horizontal"
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        board = self.board
+        bit = 1 << self.i * board.width + self.j
+        if key == "player":
+            board.set_player(self.i, self.j, value)
+        elif key in self._flags:
+            mask = getattr(board, key)
+            setattr(board, key, mask | bit if value else mask & ~bit)
+        elif key == "orientation":
+            board.vertical = board.vertical | bit if value == "vertical" else board.vertical & ~bit
+        else:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        keys = ["player", "wall_origin", "wall_down", "wall_right"]
+        if self["wall_origin"]:
+            keys.append("orientation")
+        return keys
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __eq__(self, other):
+        if isinstance(other, (_Cell, dict)):
+            return {key: self[key] for key in self.keys()} == {key: other[key] for key in other.keys()}
+        return NotImplemented
+
+    def __repr__(self):
+        return repr({key: self[key] for key in self.keys()})
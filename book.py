@@ -0,0 +1,182 @@
+"""
+Opening book: best moves of the first plies stored in a sorted binary file keyed by Zobrist keys (Quoridor.key).
+Example:
+    python book.py book.bin --depth 4 --ai "SearchAI:time_limit=1.0" --workers 4
+The book is memory-mapped by OpeningBook, so it is not parsed and processes share its pages.
+"""
+import argparse
+import copy
+import mmap
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+from quoridor import Quoridor
+
+MAGIC = b"QBOOK1"
+# Magic, height, width, walls per player, players number and a number of entries
+HEADER = struct.Struct("<6sBBBBI")
+# Key, move kind (see KINDS), i, j; entries are sorted by keys
+ENTRY = struct.Struct("<QBBB")
+KINDS = [("pawn", None), ("wall", "horizontal"), ("wall", "vertical")]
+
+
+class OpeningBook:
+    """Read-only memory-mapped opening book."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.height, self.width, self.walls_number, self.players_number, self.size = \
+            HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not an opening book: {path}")
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # A book is mapped again after it was sent to another process
+        return self.path
+
+    def __setstate__(self, path):
+        self.__init__(path)
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        self.data.close()
+
+    def matches(self, game):
+        """Return True if the book was generated for the settings of the game."""
+        return (self.height, self.width, self.walls_number, self.players_number) == \
+            (game.height, game.width, game.walls_number, game.players_number)
+
+    def probe(self, key):
+        """Return the move ("pawn" or "wall", orientation, i, j) stored for the key or None."""
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            stored_key, kind, i, j = ENTRY.unpack_from(self.data, HEADER.size + middle * ENTRY.size)
+            if stored_key < key:
+                low = middle + 1
+            elif stored_key > key:
+                high = middle
+            else:
+                self.hits += 1
+                item, orientation = KINDS[kind]
+                return item, orientation, i, j
+        self.misses += 1
+        return None
+
+    def move(self, game, player):
+        """Return the book move of the current position of the game or None."""
+        if player != game.player(game.turn) or not self.matches(game):
+            return None
+        return self.probe(game.key)
+
+    def stats(self):
+        return {"entries": self.size, "hits": self.hits, "misses": self.misses}
+
+
+def write_book(path, game, moves):
+    """Write moves {key: (item, orientation, i, j)} of positions of the game settings to a book file."""
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, game.height, game.width, game.walls_number, game.players_number,
+                               len(moves)))
+        for key in sorted(moves):
+            item, orientation, i, j = moves[key]
+            file.write(ENTRY.pack(key, KINDS.index((item, orientation if item == "wall" else None)), i, j))
+
+
+def best_move_worker(task):
+    """Return the move of an AI (given as a spec, see tournament.parse_ai) in a game state."""
+    # AI.py uses OpeningBook, so the AI modules are imported when they are needed
+    import AI
+    from tournament import parse_ai
+    settings, state, spec = task
+    height, width, walls_number, backend = settings
+    game = Quoridor(height=height, width=width, walls_number=walls_number, backend=backend)
+    game.set_state(state)
+    name, kwargs = parse_ai(spec)
+    ai = getattr(AI, name)(**kwargs)
+    try:
+        return ai.move(game, game.player(game.turn))
+    finally:
+        if hasattr(ai, "close"):
+            ai.close()
+
+
+def play(game, move):
+    """Return a copy of the game after the move."""
+    game = copy.deepcopy(game)
+    item, orientation, i, j = move
+    player = game.player(game.turn)
+    if item == "pawn":
+        game.move_pawn(player, (i, j))
+    else:
+        game.place_wall(player, (i, j), orientation)
+    return game
+
+
+def generate(path, height=9, width=9, walls_number=10, depth=4, spec="SearchAI:time_limit=1.0", workers=1,
+             backend="dict"):
+    """
+    Generate a book to the given depth in plies and return a number of positions.
+    Every position gets the best move of the AI. Positions after the best move and after every pawn move
+    of the player are expanded, so the book also answers opponents who do not follow the book.
+    """
+    settings = (height, width, walls_number, backend)
+    game = Quoridor(height=height, width=width, walls_number=walls_number, backend=backend)
+    moves = {}
+    level = {game.key: game}
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        for _ in range(depth):
+            games = list(level.values())
+            tasks = [(settings, position.get_state(), spec) for position in games]
+            if executor is not None:
+                best_moves = list(executor.map(best_move_worker, tasks))
+            else:
+                best_moves = [best_move_worker(task) for task in tasks]
+
+            level = {}
+            for position, best_move in zip(games, best_moves):
+                moves[position.key] = best_move
+                player = position.player(position.turn)
+                replies = {best_move} | {("pawn", None, i, j)
+                                         for i, j in position.available_moves(position.board,
+                                                                              position.pawns_loc[player])}
+                for reply in replies:
+                    new_position = play(position, reply)
+                    if new_position.key not in moves and not new_position.won(player, new_position.pawns_loc):
+                        level[new_position.key] = new_position
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    write_book(path, game, moves)
+    return len(moves)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Generate a Quoridor opening book.")
+    parser.add_argument("path", help="book file to write")
+    parser.add_argument("--depth", type=int, default=4, help="plies from the start position")
+    parser.add_argument("--ai", default="SearchAI:time_limit=1.0", help="AI from AI.py which chooses book moves")
+    parser.add_argument("--workers", type=int, default=1, help="processes searching positions in parallel")
+    parser.add_argument("--height", type=int, default=9)
+    parser.add_argument("--width", type=int, default=9)
+    parser.add_argument("--walls", type=int, default=10, help="walls per player")
+    parser.add_argument("--backend", choices=("dict", "bitboard"), default="dict")
+    args = parser.parse_args(args)
+
+    from tournament import parse_ai
+    parse_ai(args.ai)
+    size = generate(args.path, args.height, args.width, args.walls, args.depth, args.ai, args.workers,
+                    args.backend)
+    print(f"{size} positions written to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
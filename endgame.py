@@ -0,0 +1,218 @@
+import copy
+import threading
+from collections import OrderedDict, deque
+
+# Results of a race position for the player to move
+UNKNOWN = 0  # not solved, both players can avoid losing forever (a draw)
+WIN = 1
+LOSS = 2
+
+
+class RaceTable:
+    """
+    Solved pawn race on a fixed wall layout (no walls are left, so only pawns move).
+    A state is (cell of pawn 1, cell of pawn 2, player to move) and all states are solved by retrograde analysis:
+    for every state the result, the number of plies to the end with optimal play and the best move are stored.
+    Pawn moves (with jumps) are generated by game.available_moves, so the rules are the same as in the game.
+    """
+
+    def __init__(self, game, board):
+        self.height = game.height
+        self.width = game.width
+        cells = self.height * self.width
+        size = cells * cells * 2
+        self.results = bytearray(size)
+        self.plies = [0] * size
+        self.best = [-1] * size
+
+        goals = {}
+        for player in (1, 2):
+            axis, index = game.win_side(player)
+            goals[player] = [divmod(cell, self.width)[axis] == index for cell in range(cells)]
+
+        successors = self.successors(game, board, goals)
+        predecessors = [[] for _ in range(size)]
+        counts = [0] * size
+        queue = deque()
+        for state, moves in enumerate(successors):
+            if moves is None:
+                continue
+            counts[state] = len(moves)
+            for new_state in moves:
+                predecessors[new_state].append(state)
+
+        # The player who has to move after the opponent reached the finish line has lost
+        for state in range(size):
+            first, second, mover = self.unpack(state)
+            opponent_cell = second if mover == 1 else first
+            if goals[2 if mover == 1 else 1][opponent_cell] and first != second:
+                self.results[state] = LOSS
+                queue.append(state)
+
+        while queue:
+            state = queue.popleft()
+            for previous in predecessors[state]:
+                if self.results[previous] != UNKNOWN:
+                    continue
+                if self.results[state] == LOSS:
+                    self.results[previous] = WIN
+                    self.plies[previous] = self.plies[state] + 1
+                    queue.append(previous)
+                else:
+                    counts[previous] -= 1
+                    if counts[previous] == 0:
+                        self.results[previous] = LOSS
+                        self.plies[previous] = self.plies[state] + 1
+                        queue.append(previous)
+
+        for state, moves in enumerate(successors):
+            if moves:
+                self.best[state] = self.choose(moves)
+
+    def index(self, first, second, mover):
+        """Return a state of pawn cells (indexes i * width + j) and the player to move."""
+        return (first * self.height * self.width + second) * 2 + mover - 1
+
+    def unpack(self, state):
+        """Return (cell of pawn 1, cell of pawn 2, player to move) of a state."""
+        pair, mover = divmod(state, 2)
+        first, second = divmod(pair, self.height * self.width)
+        return first, second, mover + 1
+
+    def successors(self, game, board, goals):
+        """Return a list of states after every move for non-final states (None for final or impossible states)."""
+        cells = self.height * self.width
+        board = copy.deepcopy(board)
+        pawns_loc = dict(game.pawns_loc)
+        successors = [None] * (cells * cells * 2)
+        for first in range(cells):
+            # Move pawn 2 out of the way before pawn 1 takes its cell
+            if pawns_loc[2] == divmod(first, self.width):
+                game.apply_pawn_move(board, pawns_loc, 2, divmod((first + 1) % cells, self.width))
+            game.apply_pawn_move(board, pawns_loc, 1, divmod(first, self.width))
+            for second in range(cells):
+                if second == first or goals[1][first] or goals[2][second]:
+                    continue
+                game.apply_pawn_move(board, pawns_loc, 2, divmod(second, self.width))
+                for mover in (1, 2):
+                    moves = set(game.available_moves(board, pawns_loc[mover]))
+                    new_states = []
+                    for i, j in moves:
+                        cell = i * self.width + j
+                        if mover == 1:
+                            new_states.append(self.index(cell, second, 2))
+                        else:
+                            new_states.append(self.index(first, cell, 1))
+                    successors[self.index(first, second, mover)] = new_states
+        return successors
+
+    def choose(self, moves):
+        """Return the best of the states after moves: win fast, lose slowly and prefer a draw to a loss."""
+        def rating(state):
+            result = self.results[state]
+            if result == LOSS:
+                return 0, self.plies[state]
+            if result == UNKNOWN:
+                return 1, 0
+            return 2, -self.plies[state]
+        return min(moves, key=rating)
+
+    def lookup(self, pawns_loc, player):
+        """Return (result, plies to the end, best move (i, j)) for the player to move."""
+        first = pawns_loc[1][0] * self.width + pawns_loc[1][1]
+        second = pawns_loc[2][0] * self.width + pawns_loc[2][1]
+        state = self.index(first, second, player)
+        best = self.best[state]
+        if best < 0:
+            return self.results[state], self.plies[state], None
+        new_first, new_second, _ = self.unpack(best)
+        return self.results[state], self.plies[state], divmod(new_first if player == 1 else new_second, self.width)
+
+
+class EndgameSolver:
+    """
+    Exact play when no player has walls left.
+    Race tables are kept in a LRU cache keyed by the wall configuration, so a table is solved once per layout
+    and every next move of the endgame is a table lookup.
+    Solving a table takes longer than a move may take (about 0.1 s on 9x9), so move() does not wait for it:
+    the table is solved in a background thread and the caller searches until it is ready.
+    """
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self.tables = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.building = None  # key of the table which is being solved in the background
+
+    def applies(self, walls_left):
+        """Return True if the position is a pure pawn race (two players without walls)."""
+        return len(walls_left) == 2 and not any(walls_left.values())
+
+    def table(self, game, board, wait=True):
+        """
+        Return the race table of walls on the board (solved on the first request).
+        With wait=False a missing table is solved in a background thread and None is returned.
+        """
+        key = (game.height, game.width, game.walls_key(board))
+        with self.lock:
+            table = self.tables.get(key)
+            if table is not None:
+                self.hits += 1
+                self.tables.move_to_end(key)
+                return table
+            self.misses += 1
+            if not wait:
+                if self.building is None:
+                    self.building = key
+                    # The thread gets copies, the caller goes on changing the game
+                    threading.Thread(target=self.build, args=(key, copy.deepcopy(game), copy.deepcopy(board)),
+                                     daemon=True).start()
+                return None
+        table = RaceTable(game, board)
+        with self.lock:
+            self.store(key, table)
+        return table
+
+    def build(self, key, game, board):
+        """Solve a table in the background thread."""
+        try:
+            table = RaceTable(game, board)
+            with self.lock:
+                self.store(key, table)
+        finally:
+            self.building = None
+
+    def store(self, key, table):
+        self.tables[key] = table
+        if len(self.tables) > self.maxsize:
+            self.tables.popitem(last=False)
+
+    def solve(self, game, board, pawns_loc, player):
+        """Return (result, plies to the end, best move (i, j)) of the race position for the player to move."""
+        return self.table(game, board).lookup(pawns_loc, player)
+
+    def move(self, game, board, pawns_loc, walls_left, player):
+        """
+        Return the optimal AI move ("pawn", None, i, j) in a wall-exhausted position or None otherwise.
+        None is also returned while the table of the position is being solved.
+        """
+        if not self.applies(walls_left):
+            return None
+        table = self.table(game, board, wait=False)
+        if table is None:
+            return None
+        result, plies, loc = table.lookup(pawns_loc, player)
+        if loc is None:
+            return None
+        return "pawn", None, loc[0], loc[1]
+
+    def clear(self):
+        with self.lock:
+            self.tables.clear()
+
+    def stats(self):
+        """Return cached tables, hits, misses and whether a table is being solved."""
+        return {"tables": len(self.tables), "hits": self.hits, "misses": self.misses,
+                "building": self.building is not None}
@@ -0,0 +1,119 @@
+import copy
+import queue
+import threading
+
+
+class AIWorker:
+    """
+    Runs an AI in a background thread, so the caller (the pygame loop) is never blocked by a search.
+    move(game, player) asks for a move and returns it when it is ready (None until then).
+    ponder(game, player) uses the opponent's turn to find replies of the player to likely opponent moves;
+    when the opponent plays one of them, the reply is ready at once.
+    The thread works on copies of the game, so the game can be changed while the AI is thinking.
+    An exception raised by the AI does not stop the thread, it is raised again by move().
+    """
+
+    def __init__(self, ai, ponder_moves=8):
+        self.ai = ai
+        self.ponder_moves = ponder_moves  # opponent moves to answer in advance
+        self.tasks = queue.Queue()
+        self.results = queue.Queue()
+        self.replies = {}  # position key -> move found by pondering
+        self.generation = 0  # results of older generations are dropped (see reset)
+        self.requested = None  # (key, player) of the last move request
+        self.pondered = None  # (key, player) of the last pondered position
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def move(self, game, player):
+        """
+        Return a move of the player in the current position of the game or None if it is not ready yet.
+        If the AI failed to find the move, its exception is raised.
+        """
+        position = (game.key, player)
+        if self.requested != position:
+            self.requested = position
+            self.tasks.put(("move", self.generation, copy.deepcopy(game), player))
+        while True:
+            try:
+                generation, key, result_player, move = self.results.get_nowait()
+            except queue.Empty:
+                return None
+            if generation == self.generation and (key, result_player) == position:
+                self.requested = None
+                if isinstance(move, Exception):
+                    raise move
+                return move
+
+    def ponder(self, game, player):
+        """Think about replies of the player while the opponent is choosing a move in the game."""
+        position = (game.key, player)
+        if self.pondered != position:
+            self.pondered = position
+            self.tasks.put(("ponder", self.generation, copy.deepcopy(game), player))
+
+    def reset(self, ai=None):
+        """Drop all pending work (and replace the AI) when a new game starts."""
+        self.generation += 1
+        self.tasks.put(("reset", self.generation, ai, None))
+        self.requested = None
+        self.pondered = None
+
+    def stop(self):
+        self.tasks.put(None)
+        self.thread.join()
+
+    def run(self):
+        while True:
+            # Only the latest task matters, older ones were superseded (but every reset is applied)
+            tasks = [self.tasks.get()]
+            while not self.tasks.empty():
+                tasks.append(self.tasks.get())
+            if None in tasks:
+                return
+            for task in tasks:
+                if task[0] == "reset":
+                    self.apply_reset(task)
+            kind, generation, game, player = tasks[-1]
+            if kind == "move":
+                move = self.replies.get(game.key)
+                if move is None:
+                    try:
+                        move = self.ai.move(game, player)
+                    except Exception as error:
+                        # The caller of move gets the exception instead of waiting forever
+                        move = error
+                self.replies.clear()
+                self.results.put((generation, game.key, player, move))
+            elif kind == "ponder":
+                try:
+                    self.think_ahead(game, player)
+                except Exception:
+                    # Pondering is optional, the move request will run the AI again and report the error
+                    self.replies.clear()
+
+    def apply_reset(self, task):
+        kind, generation, ai, player = task
+        if ai is not None:
+            if hasattr(self.ai, "close"):
+                self.ai.close()
+            self.ai = ai
+        self.replies.clear()
+
+    def think_ahead(self, game, player):
+        """Find moves of the player after the most likely pawn moves of the opponent (closest to its goal first)."""
+        opponent = game.player(game.turn)
+        if game.won(player, game.pawns_loc) or game.won(opponent, game.pawns_loc):
+            return
+        distances = self.ai.map_dist(game, game.board, opponent, flat=True)
+        moves = game.available_moves(game.board, game.pawns_loc[opponent])
+        moves.sort(key=lambda cell: distances[cell[0] * game.width + cell[1]])
+        for loc in moves[:self.ponder_moves]:
+            # Stop when the opponent moved or there is other work
+            if not self.tasks.empty():
+                return
+            position = copy.deepcopy(game)
+            position.move_pawn(opponent, loc)
+            if position.key in self.replies or position.won(opponent, position.pawns_loc):
+                continue
+            self.replies[position.key] = self.ai.move(position, player)
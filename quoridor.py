@@ -1,6 +1,28 @@
 import random
 import itertools
-import copy
+import heapq
+import functools
+from collections import deque
+
+from bitboard import BitBoard
+
+
+@functools.lru_cache(maxsize=None)
+def zobrist_tables(height, width, walls_number, players_number):
+    """
+    Return random 64-bit numbers for Zobrist keys: pawns[player][cell], walls[(loc, orientation)],
+    walls_left[player][n] and a number for the second player to move.
+    The generator is seeded by the game settings, so keys are the same in every process.
+    """
+    rng = random.Random(f"quoridor-{height}x{width}-{walls_number}-{players_number}")
+    pawns = {player: [rng.getrandbits(64) for _ in range(height * width)]
+             for player in range(1, players_number + 1)}
+    walls = {((i, j), orientation): rng.getrandbits(64)
+             for i in range(height - 1) for j in range(width - 1) for orientation in ["horizontal", "vertical"]}
+    walls_left = {player: [rng.getrandbits(64) for _ in range(walls_number + 1)]
+                  for player in range(1, players_number + 1)}
+    side = rng.getrandbits(64)
+    return pawns, walls, walls_left, side
 
 
 class Quoridor:
@@ -8,28 +30,35 @@ class Quoridor:
     Game representation.
     """
 
-    def __init__(self, height=9, width=9, walls_number=10, players_number=2):
+    def __init__(self, height=9, width=9, walls_number=10, players_number=2, backend="dict"):
 
         # Set initial size and number of walls
         self.height = height
         self.width = width
         self.walls_number = walls_number
         self.players_number = players_number
+        self.backend = backend
 
         # Initialize an empty board
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(
-                    {"player": 0,
-                     "wall_origin": False,
-                     # "wall_up": False,
-                     "wall_down": False,
-                     # "wall_left": False,
-                     "wall_right": False}
-                )
-            self.board.append(row)
+        if backend == "bitboard":
+            # Compact board with the same dict view (board[i][j]["player"])
+            self.board = BitBoard(self.height, self.width)
+        elif backend == "dict":
+            self.board = []
+            for i in range(self.height):
+                row = []
+                for j in range(self.width):
+                    row.append(
+                        {"player": 0,
+                         "wall_origin": False,
+                         # "wall_up": False,
+                         "wall_down": False,
+                         # "wall_left": False,
+                         "wall_right": False}
+                    )
+                self.board.append(row)
+        else:
+            raise ValueError(f"Unknown board backend: {backend}")
 
         # Initialize players' pawns (i, j) = (y, x)
         self.pawns_loc = {1: (self.height - 1, self.width // 2),
@@ -62,6 +91,58 @@ class Quoridor:
             for player in range(1, players_number + 1)
         }
 
+        # Walls which do not overlap placed walls and walls which also leave paths for both players.
+        # Both sets are kept up to date by move_pawn and place_wall.
+        self._board_changes = 0  # uncommitted apply_* calls on self.board
+        self._free_walls = self.free_walls(self.board)
+        self.legal_walls = self.filter_walls(self.board, self.pawns_loc, self._free_walls)
+
+        # Counter of turns and Zobrist key of the position, updated by move_pawn and place_wall
+        self.turn = 0
+        self.key = self.position_key(self.board, self.pawns_loc,
+                                     {player: self.walls_left(player) for player in self.walls}, self.player(self.turn))
+
+        # Cells where the player who has the next turn can move (a set for the renderer, do not modify it)
+        self._update_pawn_moves()
+
+    def walls_left(self, player):
+        """Return a number of unused walls of the player."""
+        return sum(not wall["placed"] for wall in self.walls[player])
+
+    def position_key(self, board, pawns_loc, walls_left, player):
+        """
+        Return a 64-bit Zobrist key of a position: pawns, placed walls, unused walls ({player: number})
+        and the player who has the next turn.
+        """
+        pawn_keys, wall_keys, walls_left_keys, side_key = zobrist_tables(
+            self.height, self.width, self.walls_number, self.players_number)
+        key = 0
+        for pawn, (i, j) in pawns_loc.items():
+            key ^= pawn_keys[pawn][i * self.width + j]
+        for number_player, number in walls_left.items():
+            key ^= walls_left_keys[number_player][number]
+        for i in range(self.height - 1):
+            for j in range(self.width - 1):
+                if board[i][j]["wall_origin"]:
+                    key ^= wall_keys[((i, j), board[i][j]["orientation"])]
+        if player == 2:
+            key ^= side_key
+        return key
+
+    def key_after_pawn_move(self, key, player, prev_loc, loc):
+        """Return a position key after the player moved a pawn (the turn passes to the other player)."""
+        pawn_keys, wall_keys, walls_left_keys, side_key = zobrist_tables(
+            self.height, self.width, self.walls_number, self.players_number)
+        return (key ^ pawn_keys[player][prev_loc[0] * self.width + prev_loc[1]]
+                ^ pawn_keys[player][loc[0] * self.width + loc[1]] ^ side_key)
+
+    def key_after_wall(self, key, player, loc, orientation, walls_left):
+        """Return a position key after the player who had walls_left unused walls placed a wall."""
+        pawn_keys, wall_keys, walls_left_keys, side_key = zobrist_tables(
+            self.height, self.width, self.walls_number, self.players_number)
+        return (key ^ wall_keys[(loc, orientation)]
+                ^ walls_left_keys[player][walls_left] ^ walls_left_keys[player][walls_left - 1] ^ side_key)
+
     def player(self, turn):
         """Returns player who has the next turn on a board."""
         if turn % 2 == 0:
@@ -69,6 +150,16 @@ class Quoridor:
         else:
             return 2
 
+    def win_side(self, player):
+        """Return axis (0 for rows, 1 for columns) and index of the line where the player wins."""
+        if player == 1:
+            return 0, 0
+        elif player == 2:
+            return 0, self.height - 1
+        elif player == 3:
+            return 1, self.width - 1
+        return 1, 0
+
     def won(self, player, pawns_loc):
         """Check if the player reached the other side of the board."""
         # Define for player a win side of the board
@@ -92,6 +183,9 @@ class Quoridor:
         Return a list with cells where a pawn can move.
         When planning=True a cells with pawns counts as empty (available for moving).
         """
+        if isinstance(board, BitBoard):
+            return board.available_moves(loc, planning)
+
         available_moves = []
         pawn_i = loc[0]
         pawn_j = loc[1]
@@ -141,6 +235,9 @@ class Quoridor:
 
     def is_barrier(self, board, loc_a, loc_b):
         """Check if there is a barrier between two neighboring cells."""
+        if isinstance(board, BitBoard):
+            return board.is_barrier(loc_a, loc_b)
+
         i, j = loc_a[0], loc_a[1]
         fin_i, fin_j = loc_b[0], loc_b[1]
         d_i, d_j = i - fin_i, j - fin_j
@@ -159,30 +256,241 @@ class Quoridor:
         return False
 
     def path_finder(self, virt_board, player, pawns_loc):
-        """Return True if path to other side of the board is clear (and victory is available)."""
-        frontier = [cell for cell in self.available_moves(virt_board, pawns_loc[player])]
-        explored = set()
-        while True:
-            if not frontier:
-                return False
-
-            cell = frontier[-1]
-            pawn_loc = {player: cell}
+        """
+        Return True if path to other side of the board is clear (and victory is available).
+        Every cell is explored at most once. Cells closer to the win side are explored first,
+        so an open path is found without flooding the whole board.
+        """
+        if isinstance(virt_board, BitBoard):
+            return virt_board.path_finder(player, pawns_loc)
 
-            if self.won(player, pawn_loc):
+        axis, win_side = self.win_side(player)
+        start = pawns_loc[player]
+        explored = {start}
+        frontier = deque([start])
+        while frontier:
+            cell = frontier.pop()
+            if cell[axis] == win_side:
                 return True
+            for new_cell in self.neighbours(virt_board, cell):
+                if new_cell not in explored:
+                    explored.add(new_cell)
+                    # Steps towards the win side go to the top of the stack, others to the bottom
+                    if abs(win_side - new_cell[axis]) < abs(win_side - cell[axis]):
+                        frontier.append(new_cell)
+                    else:
+                        frontier.appendleft(new_cell)
+        return False
+
+    def neighbours(self, board, loc):
+        """Return cells next to the cell which are not separated from it by walls (pawns are ignored)."""
+        if isinstance(board, BitBoard):
+            return board.neighbours(loc)
 
-            explored.add(cell)
-            frontier = frontier[:-1]
-            for new_cell in self.available_moves(virt_board, pawn_loc[player], planning=True):
-                if new_cell not in frontier and new_cell not in explored:
+        i, j = loc
+        cells = []
+        if i > 0 and not board[i - 1][j]["wall_down"]:
+            cells.append((i - 1, j))
+        if i < self.height - 1 and not board[i][j]["wall_down"]:
+            cells.append((i + 1, j))
+        if j > 0 and not board[i][j - 1]["wall_right"]:
+            cells.append((i, j - 1))
+        if j < self.width - 1 and not board[i][j]["wall_right"]:
+            cells.append((i, j + 1))
+        return cells
+
+    def shortest_path(self, board, player, loc):
+        """Return a list of cells of a shortest path from loc to the win side of the board or None."""
+        if isinstance(board, BitBoard):
+            path = board.shortest_path(board.index(loc), board.goal_mask(player))
+            if path is None:
+                return None
+            return [divmod(k, self.width) for k in path]
+
+        axis, win_side = self.win_side(player)
+        parents = {loc: None}
+        frontier = deque([loc])
+        while frontier:
+            cell = frontier.popleft()
+            if cell[axis] == win_side:
+                path = []
+                while cell is not None:
+                    path.append(cell)
+                    cell = parents[cell]
+                path.reverse()
+                return path
+            for new_cell in self.neighbours(board, cell):
+                if new_cell not in parents:
+                    parents[new_cell] = cell
                     frontier.append(new_cell)
+        return None
 
-    def available_walls(self, board, loc, player):
-        """Return a list with cells where walls can be placed or None there are no unused walls."""
-        available_walls = []
+    def distance_maps(self, board, players=(1, 2)):
+        """
+        Return {player: distances} where distances[i * width + j] is the number of steps
+        from the cell (i, j) to the win side of the board (pawns are ignored, unreachable cells get width * height).
+        Breadth-first search starts from the whole win side; neighbours of cells are computed once for all players.
+        """
+        max_value = self.height * self.width
+        if isinstance(board, BitBoard):
+            return {player: board.distance_map(board.goal_mask(player), max_value) for player in players}
+
+        neighbours = []
+        for i in range(self.height):
+            for j in range(self.width):
+                neighbours.append([new_i * self.width + new_j for new_i, new_j in self.neighbours(board, (i, j))])
+
+        maps = {}
+        for player in players:
+            axis, win_side = self.win_side(player)
+            distances = [max_value] * max_value
+            if axis == 0:
+                frontier = deque(range(win_side * self.width, (win_side + 1) * self.width))
+            else:
+                frontier = deque(range(win_side, max_value, self.width))
+            for k in frontier:
+                distances[k] = 0
+            while frontier:
+                k = frontier.popleft()
+                dist = distances[k] + 1
+                for new_k in neighbours[k]:
+                    if distances[new_k] == max_value:
+                        distances[new_k] = dist
+                        frontier.append(new_k)
+            maps[player] = distances
+        return maps
+
+    def update_distance_map(self, board, distances, loc, orientation, walls_key=None):
+        """
+        Return a distance map (see distance_maps) after the wall was placed on the board.
+        distances is the map before the wall (it is not modified). Only cells which lost
+        every neighbour closer to the win side are recomputed.
+        walls_key of the board with the wall can be given when it is already known.
+        """
+        width = self.width
+        max_value = self.height * width
+        last_row = max_value - width
+        distances = distances[:]
+        # Neighbours are read from masks of blocked edges, which is fast for both backends
+        down, right = walls_key if walls_key is not None else self.walls_key(board)
+
+        def neighbours(k):
+            cells = []
+            if k >= width and not down >> k - width & 1:
+                cells.append(k - width)
+            if k < last_row and not down >> k & 1:
+                cells.append(k + width)
+            j = k % width
+            if j and not right >> k - 1 & 1:
+                cells.append(k - 1)
+            if j < width - 1 and not right >> k & 1:
+                cells.append(k + 1)
+            return cells
+
+        # Cells whose step to a closer neighbour is blocked by the wall
+        heap = []
+        for cell_a, cell_b in self.wall_edges(loc, orientation):
+            a, b = cell_a[0] * width + cell_a[1], cell_b[0] * width + cell_b[1]
+            if distances[a] == distances[b] + 1:
+                heapq.heappush(heap, (distances[a], a))
+            elif distances[b] == distances[a] + 1:
+                heapq.heappush(heap, (distances[b], b))
+
+        # Collect cells which have no closer neighbour left (in order of distance, so closer cells are decided first)
+        affected = set()
+        while heap:
+            dist, k = heapq.heappop(heap)
+            if k in affected or dist == max_value:
+                continue
+            cells = neighbours(k)
+            if any(distances[n] == dist - 1 and n not in affected for n in cells):
+                continue
+            affected.add(k)
+            for n in cells:
+                if distances[n] == dist + 1 and n not in affected:
+                    heapq.heappush(heap, (dist + 1, n))
 
-        # if not all(wall["placed"] for wall in self.walls[player]):
+        # Recompute distances of affected cells starting from their unaffected neighbours
+        for k in affected:
+            distances[k] = max_value
+        for k in affected:
+            for n in neighbours(k):
+                if n not in affected and distances[n] + 1 < distances[k]:
+                    distances[k] = distances[n] + 1
+            if distances[k] < max_value:
+                heapq.heappush(heap, (distances[k], k))
+        while heap:
+            dist, k = heapq.heappop(heap)
+            if dist > distances[k]:
+                continue
+            for n in neighbours(k):
+                if n in affected and dist + 1 < distances[n]:
+                    distances[n] = dist + 1
+                    heapq.heappush(heap, (dist + 1, n))
+        return distances
+
+    def walls_key(self, board):
+        """Return a compact hashable key of walls on the board (masks of blocked down and right edges)."""
+        if isinstance(board, BitBoard):
+            return board.wall_down, board.wall_right
+
+        down = right = 0
+        bit = 1
+        for row in board:
+            for cell in row:
+                if cell["wall_down"]:
+                    down |= bit
+                if cell["wall_right"]:
+                    right |= bit
+                bit <<= 1
+        return down, right
+
+    def add_wall_to_key(self, walls_key, loc, orientation):
+        """Return walls_key of the board after the wall is placed."""
+        down, right = walls_key
+        k = loc[0] * self.width + loc[1]
+        if orientation == "horizontal":
+            return down | 1 << k | 1 << k + 1, right
+        return down, right | 1 << k | 1 << k + self.width
+
+    def wall_edges(self, loc, orientation):
+        """Return two pairs of neighboring cells which the wall separates."""
+        i, j = loc
+        if orientation == "horizontal":
+            return ((i, j), (i + 1, j)), ((i, j + 1), (i + 1, j + 1))
+        return ((i, j), (i, j + 1)), ((i + 1, j), (i + 1, j + 1))
+
+    def cutting_walls(self, path):
+        """Return a set of walls (loc, orientation) which separate any two consecutive cells of the path."""
+        walls = set()
+        for (i, j), (new_i, new_j) in zip(path, path[1:]):
+            if j == new_j:
+                i = min(i, new_i)
+                for wall_j in [j - 1, j]:
+                    if 0 <= wall_j < self.width - 1:
+                        walls.add(((i, wall_j), "horizontal"))
+            else:
+                j = min(j, new_j)
+                for wall_i in [i - 1, i]:
+                    if 0 <= wall_i < self.height - 1:
+                        walls.add(((wall_i, j), "vertical"))
+        return walls
+
+    def overlapping_walls(self, loc, orientation):
+        """Return a set of walls which can not be placed together with the wall (including the wall)."""
+        i, j = loc
+        if orientation == "horizontal":
+            neighbours = [((i, j - 1), "horizontal"), ((i, j + 1), "horizontal")]
+        else:
+            neighbours = [((i - 1, j), "vertical"), ((i + 1, j), "vertical")]
+        return {((i, j), "horizontal"), ((i, j), "vertical"), *neighbours}
+
+    def free_walls(self, board):
+        """Return a set of walls (loc, orientation) which do not overlap or cross walls on the board."""
+        if isinstance(board, BitBoard):
+            return board.free_walls()
+
+        free_walls = set()
         for i in range(self.height - 1):
             for j in range(self.width - 1):
                 is_barriers = {
@@ -190,25 +498,193 @@ class Quoridor:
                     "horizontal": board[i][j]["wall_down"] or board[i][j + 1]["wall_down"],
                     "vertical": board[i][j]["wall_right"] or board[i + 1][j]["wall_right"]
                 }
-                # print(i, j, is_barriers)
                 for orientation in ["horizontal", "vertical"]:
                     if not (is_barriers["common"] or is_barriers[orientation]):
-                        virt_board = copy.deepcopy(board)
-                        virt_board[i][j]["wall_origin"] = True
-                        virt_board[i][j]["orientation"] = orientation
-                        if orientation == "horizontal":
-                            virt_board[i][j]["wall_down"] = True
-                            virt_board[i][j + 1]["wall_down"] = True
-                        else:
-                            virt_board[i][j]["wall_right"] = True
-                            virt_board[i + 1][j]["wall_right"] = True
-
-                        if self.path_finder(virt_board, 1, loc) \
-                                and self.path_finder(virt_board, 2, loc):
-                            wall = {
-                                "loc": (i, j),
-                                "orientation": orientation
-                            }
-                            available_walls.append(wall)
-        # print(*available_walls, sep="\n")
-        return available_walls
+                        free_walls.add(((i, j), orientation))
+        return free_walls
+
+    def filter_walls(self, board, loc, walls):
+        """
+        Return a set of walls from the given free walls which leave a path for both players.
+        A wall which does not cut the current shortest path of any player can not block them,
+        so the search is run only for walls on these paths.
+        """
+        if isinstance(board, BitBoard):
+            return board.filter_walls(loc, walls)
+
+        # Edges of players' shortest paths (None means that every wall has to be checked)
+        path_edges = set()
+        for pawn in [1, 2]:
+            path = self.shortest_path(board, pawn, loc[pawn])
+            if path is None:
+                path_edges = None
+                break
+            for cell_a, cell_b in zip(path, path[1:]):
+                path_edges.add((cell_a, cell_b))
+                path_edges.add((cell_b, cell_a))
+
+        legal_walls = set()
+        for wall in walls:
+            if path_edges is not None and not any(edge in path_edges for edge in self.wall_edges(*wall)):
+                legal_walls.add(wall)
+            else:
+                # Try the wall on the board itself and restore it afterwards
+                self._set_wall(board, *wall, True)
+                if self.path_finder(board, 1, loc) and self.path_finder(board, 2, loc):
+                    legal_walls.add(wall)
+                self._set_wall(board, *wall, False)
+        return legal_walls
+
+    def walls_after_wall(self, board, loc, free_walls, legal_walls, loc_wall, orientation):
+        """
+        Return new sets (free walls, legal walls) after the wall (already on the board) was placed.
+        Only walls crossing the new one are not free anymore.
+        A new wall never opens a path, so only walls that were legal can stay legal.
+        """
+        free_walls = free_walls - self.overlapping_walls(loc_wall, orientation)
+        return free_walls, self.filter_walls(board, loc, legal_walls & free_walls)
+
+    def walls_after_pawn_move(self, board, loc, free_walls, legal_walls, prev_loc, new_loc):
+        """
+        Return legal walls after a pawn moved from prev_loc to new_loc (the same set if nothing changed).
+        A wall which does not separate the cells the pawn went through leaves both cells on the same side,
+        so only such separating walls are checked again.
+        """
+        (i, j), (new_i, new_j) = prev_loc, new_loc
+        if abs(i - new_i) + abs(j - new_j) == 1:
+            paths = [[prev_loc, new_loc]]
+        elif i == new_i or j == new_j:
+            paths = [[prev_loc, ((i + new_i) // 2, (j + new_j) // 2), new_loc]]
+        else:
+            # A diagonal jump goes around the other pawn on one of two sides
+            paths = [[prev_loc, (i, new_j), new_loc], [prev_loc, (new_i, j), new_loc]]
+        walls = set().union(*map(self.cutting_walls, paths)) & free_walls
+        new_legal = self.filter_walls(board, loc, walls)
+        if new_legal == walls & legal_walls:
+            return legal_walls
+        return legal_walls - walls | new_legal
+
+    def available_walls(self, board, loc, player):
+        """
+        Return a set of walls (loc, orientation) which can be placed.
+        For the current game state it is the legal_walls set, which is not recomputed (do not modify it).
+        """
+        if board is self.board and loc is self.pawns_loc and self._board_changes == 0:
+            return self.legal_walls
+        return self.filter_walls(board, loc, self.free_walls(board))
+
+    def place_wall(self, player, loc, orientation, wall=None):
+        """Place a wall of the player (first unused one by default) in the game and update legal walls."""
+        if wall is None:
+            wall = next(wall for wall in self.walls[player] if not wall["placed"])
+        self.key = self.key_after_wall(self.key, player, loc, orientation, self.walls_left(player))
+        self.turn += 1
+        self._set_wall(self.board, loc, orientation, True)
+        wall["loc"] = loc
+        wall["orientation"] = orientation
+        wall["placed"] = True
+        wall["active"] = False
+
+        self._free_walls, self.legal_walls = self.walls_after_wall(self.board, self.pawns_loc, self._free_walls,
+                                                                   self.legal_walls, loc, orientation)
+        self._update_pawn_moves()
+
+    def move_pawn(self, player, loc):
+        """Move a pawn of the player in the game and update legal walls."""
+        prev_loc = self._set_pawn(self.board, self.pawns_loc, player, loc)
+        self.key = self.key_after_pawn_move(self.key, player, prev_loc, loc)
+        self.turn += 1
+        self.legal_walls = self.walls_after_pawn_move(self.board, self.pawns_loc, self._free_walls,
+                                                      self.legal_walls, prev_loc, loc)
+        self._update_pawn_moves()
+
+    def get_state(self, player=None):
+        """
+        Return a compact picklable state of the game: (pawns_loc, placed walls {player: [(loc, orientation)]}, turn).
+        With a player the turn is moved forward to the player's next turn if needed.
+        The same game can be restored with set_state.
+        """
+        placed_walls = {wall_player: [(wall["loc"], wall["orientation"]) for wall in walls if wall["placed"]]
+                        for wall_player, walls in self.walls.items()}
+        turn = self.turn
+        while player is not None and self.player(turn) != player:
+            turn += 1
+        return dict(self.pawns_loc), placed_walls, turn
+
+    def set_state(self, state):
+        """Put the game (which must be new) into a state returned by get_state."""
+        pawns_loc, placed_walls, turn = state
+        for player, loc in pawns_loc.items():
+            self._set_pawn(self.board, self.pawns_loc, player, tuple(loc))
+        for player, player_walls in placed_walls.items():
+            for wall, (loc, orientation) in zip(self.walls[player], player_walls):
+                self._set_wall(self.board, tuple(loc), orientation, True)
+                wall["loc"] = tuple(loc)
+                wall["orientation"] = orientation
+                wall["placed"] = True
+        self.turn = turn
+        self._free_walls = self.free_walls(self.board)
+        self.legal_walls = self.filter_walls(self.board, self.pawns_loc, self._free_walls)
+        self.key = self.position_key(self.board, self.pawns_loc,
+                                     {player: self.walls_left(player) for player in self.walls}, self.player(self.turn))
+        self._update_pawn_moves()
+
+    def apply_wall(self, board, loc, orientation):
+        """Place a wall on the board in place (without any checks). Reverted by undo_wall."""
+        if board is self.board:
+            self._board_changes += 1
+        self._set_wall(board, loc, orientation, True)
+
+    def undo_wall(self, board, loc, orientation):
+        """Remove a wall placed by apply_wall and restore the board exactly."""
+        if board is self.board:
+            self._board_changes -= 1
+        self._set_wall(board, loc, orientation, False)
+
+    def apply_pawn_move(self, board, pawns_loc, player, loc):
+        """Move a pawn of the player in place. Return previous location of the pawn (for undo_pawn_move)."""
+        if board is self.board:
+            self._board_changes += 1
+        return self._set_pawn(board, pawns_loc, player, loc)
+
+    def undo_pawn_move(self, board, pawns_loc, player, prev_loc):
+        """Return a pawn of the player to its previous location."""
+        if board is self.board:
+            self._board_changes -= 1
+        self._set_pawn(board, pawns_loc, player, prev_loc)
+
+    def _set_wall(self, board, loc, orientation, placed):
+        """Set or remove a wall on the board."""
+        if isinstance(board, BitBoard):
+            if placed:
+                board.apply_wall(loc, orientation)
+            else:
+                board.undo_wall(loc, orientation)
+            return
+
+        i, j = loc
+        board[i][j]["wall_origin"] = placed
+        if placed:
+            board[i][j]["orientation"] = orientation
+        else:
+            del board[i][j]["orientation"]
+        if orientation == "horizontal":
+            board[i][j]["wall_down"] = placed
+            board[i][j + 1]["wall_down"] = placed
+        else:
+            board[i][j]["wall_right"] = placed
+            board[i + 1][j]["wall_right"] = placed
+
+    def _update_pawn_moves(self):
+        self.legal_pawn_moves = set(self.available_moves(self.board, self.pawns_loc[self.player(self.turn)]))
+
+    def _set_pawn(self, board, pawns_loc, player, loc):
+        """Move a pawn on the board and return its previous location."""
+        prev_i, prev_j = pawns_loc[player]
+        if isinstance(board, BitBoard):
+            board.pawns[player] = board.index(loc)
+        else:
+            board[prev_i][prev_j]["player"] = 0
+            board[loc[0]][loc[1]]["player"] = player
+        pawns_loc[player] = loc
+        return prev_i, prev_j
@@ -0,0 +1,206 @@
+"""
+Compact game records.
+A record file starts with MAGIC and holds games one after another. Every game is a header
+(height, width, walls per player, players number), a list of moves and END.
+A move is one byte when all moves of the board size fit into it (9x9 and smaller), otherwise two bytes
+(square boards up to 148x148):
+a pawn move is a cell i * width + j, a wall is height * width + (i * (width - 1) + j) * 2 + orientation.
+"""
+import mmap
+import os
+import struct
+
+from quoridor import Quoridor
+
+MAGIC = b"QREC1"
+HEADER = struct.Struct("<BBBB")
+ORIENTATIONS = ("horizontal", "vertical")
+
+
+def move_size(height, width):
+    """Return the number of bytes of one move for the board size."""
+    codes = height * width + (height - 1) * (width - 1) * 2
+    if codes >= 0xFFFF:
+        raise ValueError(f"A {height}x{width} board has too many moves for a game record")
+    return 1 if codes < 0xFF else 2
+
+
+def end_code(size):
+    return 0xFF if size == 1 else 0xFFFF
+
+
+def encode_move(height, width, move):
+    """Return a code of a move ("pawn" or "wall", orientation, i, j)."""
+    item, orientation, i, j = move
+    if item == "pawn":
+        return i * width + j
+    return height * width + (i * (width - 1) + j) * 2 + ORIENTATIONS.index(orientation)
+
+
+def decode_move(height, width, code):
+    """Return a move ("pawn" or "wall", orientation, i, j) of a code."""
+    if code < height * width:
+        i, j = divmod(code, width)
+        return "pawn", None, i, j
+    cell, orientation = divmod(code - height * width, 2)
+    i, j = divmod(cell, width - 1)
+    return "wall", ORIENTATIONS[orientation], i, j
+
+
+class RecordWriter:
+    """
+    Appends games to a record file while they are played.
+    Every move is written at once, so a game interrupted by a crash is still readable
+    (it is finished when the file is opened for writing again).
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        else:
+            self.finish_interrupted(path)
+        self.settings = None
+        self.header = None  # header of the current game until its first move is written
+
+    def finish_interrupted(self, path):
+        """Write END of the last game if the file was not closed properly (a finished file ends with 0xFF)."""
+        with open(path, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            if file.read(1) == b"\xff":
+                return
+        last = None
+        for last in RecordReader(path):
+            pass
+        if last is not None and not last.finished:
+            self.file.write(struct.pack("<B" if last.size == 1 else "<H", end_code(last.size)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start_game(self, game):
+        """
+        Start a record of a new game (the previous one is finished).
+        The game is written with its first move, so a game without moves is not recorded.
+        """
+        if self.settings is not None:
+            self.end_game()
+        self.settings = (game.height, game.width)
+        self.size = move_size(game.height, game.width)
+        self.format = "<B" if self.size == 1 else "<H"
+        self.header = HEADER.pack(game.height, game.width, game.walls_number, game.players_number)
+
+    def add_move(self, move):
+        """Write a move ("pawn" or "wall", orientation, i, j) of the current game."""
+        if self.header is not None:
+            self.file.write(self.header)
+            self.header = None
+        self.file.write(struct.pack(self.format, encode_move(*self.settings, move)))
+        self.file.flush()
+
+    def end_game(self):
+        if self.settings is not None:
+            if self.header is None:
+                self.file.write(struct.pack(self.format, end_code(self.size)))
+                self.file.flush()
+            self.settings = None
+            self.header = None
+
+    def write_game(self, game, moves):
+        """Write a whole game with the settings of the game and a list of its moves."""
+        self.start_game(game)
+        for move in moves:
+            self.add_move(move)
+        self.end_game()
+
+    def close(self):
+        self.end_game()
+        self.file.close()
+
+
+class GameRecord:
+    """A game read from a record file: settings and encoded moves (decoded on demand)."""
+
+    def __init__(self, height, width, walls_number, players_number, codes, finished=True):
+        self.height = height
+        self.width = width
+        self.walls_number = walls_number
+        self.players_number = players_number
+        self.codes = codes
+        self.size = move_size(height, width)
+        self.finished = finished  # False for a game without END (its writer was interrupted)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def moves(self):
+        """Yield moves ("pawn" or "wall", orientation, i, j) of the game."""
+        for code in self.codes:
+            yield decode_move(self.height, self.width, code)
+
+    def replay(self, backend="dict"):
+        """Yield the game (a Quoridor instance) after every move, starting from the initial position."""
+        game = Quoridor(height=self.height, width=self.width, walls_number=self.walls_number,
+                        players_number=self.players_number, backend=backend)
+        yield game
+        for item, orientation, i, j in self.moves():
+            player = game.player(game.turn)
+            if item == "pawn":
+                game.move_pawn(player, (i, j))
+            else:
+                game.place_wall(player, (i, j), orientation)
+            yield game
+
+    def final(self, backend="dict"):
+        """Return the game after the last move."""
+        for game in self.replay(backend):
+            pass
+        return game
+
+
+class RecordReader:
+    """
+    Iterates games of a record file lazily.
+    The file is memory-mapped, so only the pages of games which are read are loaded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):
+        if os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, "rb") as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if data[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"Not a game record file: {self.path}")
+            position = len(MAGIC)
+            while position + HEADER.size <= len(data):
+                height, width, walls_number, players_number = HEADER.unpack_from(data, position)
+                position += HEADER.size
+                size = move_size(height, width)
+                end = self.find_end(data, position, size)
+                if size == 1:
+                    codes = data[position:end]
+                else:
+                    codes = struct.unpack_from(f"<{(end - position) // 2}H", data, position)
+                # A game without END was interrupted, it is the last one
+                yield GameRecord(height, width, walls_number, players_number, codes, end + size <= len(data))
+                position = end + size
+        finally:
+            data.close()
+
+    def find_end(self, data, position, size):
+        """Return the position of END of a game which moves start at position (the end of data if it is missing)."""
+        marker = b"\xff" * size
+        end = data.find(marker, position)
+        # Two-byte codes are aligned, a marker found at an odd offset is a part of two moves
+        while end != -1 and (end - position) % size:
+            end = data.find(marker, end + 1)
+        if end == -1:
+            return len(data) - (len(data) - position) % size
+        return end
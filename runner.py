@@ -4,8 +4,13 @@ import time
 import copy
 import random
 import os
+import traceback
+import array
+from collections import OrderedDict
 
 from quoridor import Quoridor
+from ponder import AIWorker
+from record import RecordWriter
 import AI
 
 # Game settings
@@ -13,6 +18,17 @@ HEIGHT = 9
 WIDTH = 9
 PLAYERS_NUMBER = 2
 WALLS_NUMBER = 12
+BOARD_BACKEND = "dict"  # "dict" or "bitboard"
+
+# Rendering settings: with DIRTY_RECTS only changed areas of the window are updated
+FPS = 30
+DIRTY_RECTS = True
+TEXT_CACHE_SIZE = 64  # rendered text surfaces kept by render_text
+
+WALL_ORIENTATIONS = ("horizontal", "vertical")
+
+# Games are appended to this record file (see record.py), None to not save them
+RECORD_FILE = None
 
 # Colors
 BLACK = (0, 0, 0)
@@ -43,8 +59,17 @@ players_names = {
 }
 
 # Create game and AI agent
-game = Quoridor(height=HEIGHT, width=WIDTH, walls_number=WALLS_NUMBER)
+game = Quoridor(height=HEIGHT, width=WIDTH, walls_number=WALLS_NUMBER, backend=BOARD_BACKEND)
 ai = AI.PrimitiveAI()
+# Games are appended to RECORD_FILE, a game is written with its first move
+recorder = None
+
+
+def quit_game():
+    # The last game of the record is finished before the window closes
+    if recorder is not None:
+        recorder.close()
+    sys.exit()
 
 
 def main():
@@ -52,7 +77,13 @@ def main():
     # Create game
     global game
     global ai
+    global recorder
     pygame.init()
+    # The AI thinks in a background thread (and ponders on the opponent's turn), so the window stays responsive
+    worker = AIWorker(ai)
+    recorder = RecordWriter(RECORD_FILE) if RECORD_FILE else None
+    if recorder is not None:
+        recorder.start_game(game)
     pygame.display.set_caption("Quoridor")
     icon = pygame.image.load(os.path.join("assets", "images", "Quoridor icon 0.png"))
     pygame.display.set_icon(icon)
@@ -92,12 +123,58 @@ def main():
     storage_origin_1 = (board_origin[0] - storage_width - 50, (board_origin[1] + board_height) - storage_height - cell_size/6)
     storage_origin_2 = (board_origin[0] + cell_size * WIDTH + 50, board_origin[1] + cell_size/6)
 
+    # Reset button
+    reset_width = width // 10
+    reset_height = height // 20
+    reset_button_rect = pygame.Rect(width - reset_width - reset_height, height - 2 * reset_height,
+                                    reset_width, reset_height)
+    reset_button_border_rect = pygame.Rect(width - reset_width - reset_height - border_width,
+                                           height - 2 * reset_height - border_width,
+                                           reset_width + 2 * border_width, reset_height + 2 * border_width)
+    reset_button_text = render_text(instruction_font, "Reset", COLOR_TEXT_2)
+    reset_button_text_rect = reset_button_text.get_rect()
+    reset_button_text_rect.center = reset_button_rect.center
+
+    # Draw everything that does not change (cells, places for unused walls, Reset button) once
+    background = pygame.Surface(size).convert()
+    background.fill(COLOR_BACKGROUND)
+    for i in range(HEIGHT):
+        for j in range(WIDTH):
+            # Draw rectangle for a cell
+            rect = pygame.Rect(
+                board_origin[0] + j * cell_size,
+                board_origin[1] + i * cell_size,
+                cell_size, cell_size
+            )
+            pygame.draw.rect(background, COLOR_SQUARES, rect)
+            pygame.draw.rect(background, COLOR_BORDERS, rect, int(cell_size/5))
+            pygame.draw.rect(background, COLOR_BACKGROUND, rect, int(cell_size/6))
+
+    # Draw places for unused walls
+    for storage_origin in (storage_origin_1, storage_origin_2):
+        storage_rect = pygame.Rect(
+            storage_origin[0], storage_origin[1],
+            storage_width, storage_height
+        )
+        pygame.draw.rect(background, COLOR_SQUARES, storage_rect)
+        pygame.draw.rect(background, COLOR_BORDERS, storage_rect, int(cell_size * 0.05))
+
+    pygame.draw.rect(background, COLOR_BORDERS, reset_button_border_rect)
+    pygame.draw.rect(background, COLOR_SQUARES, reset_button_rect)
+    background.blit(reset_button_text, reset_button_text_rect)
+
+    # Areas drawn in the previous frame (None to update the whole window)
+    drawn_before = None
+
+    # Wall slot under every pixel of the board (the window is not resizable, so it is built once)
+    # and legal walls as a bitmap of slots (rebuilt when the game updates legal_walls)
+    wall_slots = build_wall_slots(board_origin, board_width, board_height, cell_size)
+    legal_slots = None
+    legal_slots_walls = None
+
     # Show instructions (menu) initially
     show_instructions = True
 
-    # Counter of turns
-    turn = 0
-
     pawn_is_active = False
     highlight_pawn = False
     active_wall = None
@@ -107,81 +184,49 @@ def main():
     while True:
 
         events = pygame.event.get()
-        screen.fill(COLOR_BACKGROUND)
 
         # Show game instructions
         if show_instructions:
+            screen.fill(COLOR_BACKGROUND)
             # Check if game quit
             for event in events:
                 if event.type == pygame.QUIT:
-                    sys.exit()
+                    quit_game()
             # Show instruction
             show_instructions, is_player_ai = draw_instructions(clock, screen, width, height, title_font, subtitle_font, instruction_font, font_size, border_width)
             continue  # Continue the loop
 
         if game_is_active:
-            active_player = game.player(turn)
+            active_player = game.player(game.turn)
         turn_is_done = False
+        # Legal moves of the active player, computed by the game once per turn
+        available_moves = game.legal_pawn_moves
+        if legal_slots_walls is not game.legal_walls:
+            legal_slots = legal_wall_slots(game.legal_walls)
+            legal_slots_walls = game.legal_walls
 
         # Draw the board
-        # board = pygame.Rect(
-        #     board_origin[0] - 2,
-        #     board_origin[1] - 2,
-        #     board_width + 4, board_height + 4)
-        # pygame.draw.rect(screen, DARK_GRAY, board)
-        cells = []
-        for i in range(HEIGHT):
-            row = []
-            for j in range(WIDTH):
-                # Draw rectangle for a cell
-                rect = pygame.Rect(
-                    board_origin[0] + j * cell_size,
-                    board_origin[1] + i * cell_size,
-                    cell_size, cell_size
-                )
-                pygame.draw.rect(screen, COLOR_SQUARES, rect)
-                pygame.draw.rect(screen, COLOR_BORDERS, rect, int(cell_size/5))
-                pygame.draw.rect(screen, COLOR_BACKGROUND, rect, int(cell_size/6))
-
-                # Draw players' pawns on a board
-                player = game.board[i][j]["player"]
-                if player != 0:
-                    # Do not draw the active pawn, because it will be drawn later as an active pawn (optional)
-                    if not pawn_is_active or player != active_player:
-                        rect = pygame.Rect(
-                            board_origin[0] + j * cell_size + (cell_size - pawn_size) / 2,
-                            board_origin[1] + i * cell_size + (cell_size - pawn_size) / 2,
-                            pawn_size, pawn_size)
-                        pygame.draw.rect(screen, COLOR_PLAYERS[str(player)], rect)
-
-                    game.pawns_loc[player] = (i, j)
-
-                # Show where player can move
-                if pawn_is_active and (i, j) in game.available_moves(game.board, game.pawns_loc[active_player]):
-                    rect = pygame.Rect(
-                        board_origin[0] + j * cell_size + (cell_size - pawn_size / 2) / 2,
-                        board_origin[1] + i * cell_size + (cell_size - pawn_size / 2) / 2,
-                        pawn_size / 2, pawn_size / 2)
-                    pygame.draw.rect(screen, COLOR_PLAYERS[str(active_player)], rect)
-
-                row.append(rect)
-            cells.append(row)
-
-        
-        # Draw places for unused walls
-        storage_rect_1 = pygame.Rect(
-            storage_origin_1[0], storage_origin_1[1],
-            storage_width, storage_height
-        )
-        pygame.draw.rect(screen, COLOR_SQUARES, storage_rect_1)
-        pygame.draw.rect(screen, COLOR_BORDERS, storage_rect_1, int(cell_size * 0.05))
+        screen.blit(background, (0, 0))
+        drawn = set()
 
-        storage_rect_2 = pygame.Rect(
-            storage_origin_2[0], storage_origin_2[1],
-            storage_width, storage_height
-        )
-        pygame.draw.rect(screen, COLOR_SQUARES, storage_rect_2)
-        pygame.draw.rect(screen, COLOR_BORDERS, storage_rect_2, int(cell_size * 0.05))
+        # Draw players' pawns on a board
+        for player, (i, j) in game.pawns_loc.items():
+            # Do not draw the active pawn, because it will be drawn later as an active pawn (optional)
+            if not pawn_is_active or player != active_player:
+                rect = pygame.Rect(
+                    board_origin[0] + j * cell_size + (cell_size - pawn_size) / 2,
+                    board_origin[1] + i * cell_size + (cell_size - pawn_size) / 2,
+                    pawn_size, pawn_size)
+                draw_rect(screen, COLOR_PLAYERS[str(player)], rect, drawn)
+
+        # Show where player can move
+        if pawn_is_active:
+            for i, j in available_moves:
+                rect = pygame.Rect(
+                    board_origin[0] + j * cell_size + (cell_size - pawn_size / 2) / 2,
+                    board_origin[1] + i * cell_size + (cell_size - pawn_size / 2) / 2,
+                    pawn_size / 2, pawn_size / 2)
+                draw_rect(screen, COLOR_PLAYERS[str(active_player)], rect, drawn)
 
         # Draw walls
         walls_rects = []
@@ -203,46 +248,24 @@ def main():
                         x = board_origin[0] + wall["loc"][1] * cell_size + cell_size * 5/6 + 1/30 * cell_size
                         y = board_origin[1] + wall["loc"][0] * cell_size + cell_size * 1/6
                         wall_rect = pygame.Rect(x, y, wall_width, wall_height)
-                    pygame.draw.rect(screen, color, wall_rect)
+                    draw_rect(screen, color, wall_rect, drawn)
 
                 else:
                     # Highlighting place where a wall can be placed
                     if wall["active"]:
-                        x, y = pygame.mouse.get_pos()
-                        if board_origin[0] + 1/6 * cell_size <= x <= board_origin[0] + board_width \
-                                and board_origin[1] + 1/6 * cell_size <= y <= board_origin[1] + board_height:
-                            cell_y = (y - board_origin[1] - 1 / 6 * cell_size) % cell_size
-                            cell_x = (x - board_origin[0] - 1 / 6 * cell_size) % cell_size
-                            if cell_y <= cell_size * 4 / 6 <= cell_x:
-                                orientation = "vertical"
-                            elif cell_y >= cell_size * 4 / 6 >= cell_x:
-                                orientation = "horizontal"
+                        slot = wall_slot_at(wall_slots, pygame.mouse.get_pos())
+                        if slot >= 0 and legal_slots[slot]:
+                            (i, j), orientation = slot_wall(slot)
+                            color = GRAY
+                            if orientation == "horizontal":
+                                x = board_origin[0] + j * cell_size + cell_size * 1 / 6
+                                y = board_origin[1] + i * cell_size + cell_size * 5 / 6 + 1 / 30 * cell_size
+                                wall_rect = pygame.Rect(x, y, wall_height, wall_width)
                             else:
-                                orientation = None
-                            if orientation is not None:
-                                i = int((y - board_origin[1] - 1 / 6 * cell_size) // cell_size)
-                                j = int((x - board_origin[0] - 1 / 6 * cell_size) // cell_size)
-                                if i == HEIGHT - 1:
-                                    i -= 1
-                                if j == WIDTH - 1:
-                                    j -= 1
-
-                                shadow_wall = {
-                                    "loc": (i, j),
-                                    "orientation": orientation
-                                }
-                                if shadow_wall in available_walls:
-
-                                    color = GRAY
-                                    if orientation == "horizontal":
-                                        x = board_origin[0] + j * cell_size + cell_size * 1 / 6
-                                        y = board_origin[1] + i * cell_size + cell_size * 5 / 6 + 1 / 30 * cell_size
-                                        wall_rect = pygame.Rect(x, y, wall_height, wall_width)
-                                    else:
-                                        x = board_origin[0] + j * cell_size + cell_size * 5 / 6 + 1 / 30 * cell_size
-                                        y = board_origin[1] + i * cell_size + cell_size * 1 / 6
-                                        wall_rect = pygame.Rect(x, y, wall_width, wall_height)
-                                    pygame.draw.rect(screen, color, wall_rect)
+                                x = board_origin[0] + j * cell_size + cell_size * 5 / 6 + 1 / 30 * cell_size
+                                y = board_origin[1] + i * cell_size + cell_size * 1 / 6
+                                wall_rect = pygame.Rect(x, y, wall_width, wall_height)
+                            draw_rect(screen, color, wall_rect, drawn)
 
                     # Draw a wall if it is unused yet (laying on a "wall storage")
                     if not wall["active"]:
@@ -260,72 +283,49 @@ def main():
                         # y = storage_origin_2[1] + board_width / 48 + wall["n"] * (wall_width + board_width / 50)
                         y = storage_origin_2[1] + wall_width + wall["n"] * wall_width * 2
                     wall_rect = pygame.Rect(x, y, wall_height, wall_width)
-                    pygame.draw.rect(screen, color, wall_rect)
+                    draw_rect(screen, color, wall_rect, drawn)
                 walls_rects.append((wall, wall_rect))
                 # maybe better version (not ready yet):
                 # wall["rect"] = wall_rect
 
-        # Draw Reset button
-        reset_width = width // 10
-        reset_height = height // 20
-        reset_button_rect = pygame.Rect(width - reset_width - reset_height, height - 2 * reset_height,
-                                        reset_width, reset_height)
-        reset_button_border_rect = pygame.Rect(width - reset_width - reset_height - border_width,
-                                               height - 2 * reset_height - border_width,
-                                               reset_width + 2 * border_width, reset_height + 2 * border_width)
-        reset_button_text = instruction_font.render("Reset", True, COLOR_TEXT_2)
-        reset_button_text_rect = reset_button_text.get_rect()
-        reset_button_text_rect.center = reset_button_rect.center
-        pygame.draw.rect(screen, COLOR_BORDERS, reset_button_border_rect)
-        pygame.draw.rect(screen, COLOR_SQUARES, reset_button_rect)
-        screen.blit(reset_button_text, reset_button_text_rect)
-
         # Draw active 'Reset?' button
         if repeat_reset:
-            pygame.draw.rect(screen, RED, reset_button_rect)
-            reset_button_text = instruction_font.render("Reset?", True, COLOR_TEXT)
-            screen.blit(reset_button_text, reset_button_text_rect)
+            draw_rect(screen, RED, reset_button_rect, drawn)
+            reset_button_active_text = render_text(instruction_font, "Reset?", COLOR_TEXT)
+            blit_text(screen, reset_button_active_text, reset_button_text_rect, "Reset?", drawn)
 
         # move = None
 
         if is_player_ai[active_player]:
         # if active_player:
         # if True:
-            if game_is_active:
-                item, orientation, i, j = ai.move(game.board, game.pawns_loc, game.walls, active_player)
+            try:
+                move = worker.move(game, active_player) if game_is_active else None
+            except Exception:
+                # The AI failed, the game stops until Reset
+                traceback.print_exc()
+                game_is_active = False
+                move = None
+            if move is not None:
+                item, orientation, i, j = move
+                if recorder is not None:
+                    recorder.add_move(move)
                 if item == "pawn":
-                    game.board[i][j]["player"] = active_player
-                    game.board[game.pawns_loc[active_player][0]][game.pawns_loc[active_player][1]]["player"] = 0
-                    game.pawns_loc[active_player] = (i, j)
+                    game.move_pawn(active_player, (i, j))
                     turn_is_done = True
                 elif item == "wall":
-                    for wall in game.walls[active_player]:
-                        if not wall["placed"]:
-                            active_wall = wall
-                            if orientation == "horizontal":
-                                # active_wall["orientation"] = "horizontal"
-                                game.board[i][j]["wall_origin"] = True
-                                game.board[i][j]["wall_down"] = True
-                                game.board[i][j + 1]["wall_down"] = True
-                            else:
-                                active_wall["orientation"] = "vertical"
-                                game.board[i][j]["wall_origin"] = True
-                                game.board[i][j]["wall_right"] = True
-                                game.board[i + 1][j]["wall_right"] = True
-
-                            active_wall["loc"] = (i, j)
-                            active_wall["placed"] = True
-                            active_wall["active"] = False
-                            active_wall = None
-                            # pawn_is_active = False
-                            # highlight_pawn = False
-                            turn_is_done = True
-                            break
+                    game.place_wall(active_player, (i, j), orientation)
+                    active_wall = None
+                    # pawn_is_active = False
+                    # highlight_pawn = False
+                    turn_is_done = True
+        elif game_is_active and any(is_player_ai.values()):
+            worker.ponder(game, 2 if active_player == 1 else 1)
 
         for event in events:
 
             if event.type == pygame.QUIT:
-                sys.exit()
+                quit_game()
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:
                     # print("event.pos: ", event.pos)
@@ -335,8 +335,11 @@ def main():
                         if repeat_reset:
                             # print("reset")
                             repeat_reset = False
-                            game = Quoridor(height=HEIGHT, width=WIDTH, walls_number=WALLS_NUMBER)
+                            game = Quoridor(height=HEIGHT, width=WIDTH, walls_number=WALLS_NUMBER, backend=BOARD_BACKEND)
                             ai = AI.PrimitiveAI()
+                            worker.reset(ai)
+                            if recorder is not None:
+                                recorder.start_game(game)
                             is_player_ai = {1: False, 2: False, random.randint(1, 2): True}
                             game_is_active = True
                         else:
@@ -348,7 +351,6 @@ def main():
                         if not is_player_ai[active_player]:
 
                             # Check if the click was on a wall
-                            available_walls = game.available_walls(game.board, game.pawns_loc, active_player)
                             for wall in walls_rects:
                                 if wall[1].collidepoint(event.pos):
                                     double_click = False
@@ -371,44 +373,16 @@ def main():
 
                             # Placing a wall
                             if active_wall:
-                                x, y = event.pos
-                                cell_y = (y - board_origin[1] - 1/6 * cell_size) % cell_size
-                                cell_x = (x - board_origin[0] - 1/6 * cell_size) % cell_size
-                                orientation = None
-                                if cell_y <= cell_size * 4/6 <= cell_x:
-                                    orientation = "vertical"
-                                elif cell_y >= cell_size * 4/6 >= cell_x:
-                                    orientation = "horizontal"
-                                if orientation is not None:
-                                    i = int((y - board_origin[1] - 1 / 6 * cell_size) // cell_size)
-                                    j = int((x - board_origin[0] - 1 / 6 * cell_size) // cell_size)
-                                    if i == HEIGHT - 1:
-                                        i -= 1
-                                    if j == WIDTH - 1:
-                                        j -= 1
-                                    virt_wall = {
-                                        "loc": (i, j),
-                                        "orientation": orientation
-                                    }
-                                    if virt_wall in available_walls:
-                                        if orientation == "horizontal":
-                                            # active_wall["orientation"] = "horizontal"
-                                            game.board[i][j]["wall_origin"] = True
-                                            game.board[i][j]["wall_down"] = True
-                                            game.board[i][j + 1]["wall_down"] = True
-                                        else:
-                                            active_wall["orientation"] = "vertical"
-                                            game.board[i][j]["wall_origin"] = True
-                                            game.board[i][j]["wall_right"] = True
-                                            game.board[i + 1][j]["wall_right"] = True
-
-                                        active_wall["loc"] = (i, j)
-                                        active_wall["placed"] = True
-                                        active_wall["active"] = False
-                                        active_wall = None
-                                        pawn_is_active = False
-                                        highlight_pawn = False
-                                        turn_is_done = True
+                                slot = wall_slot_at(wall_slots, event.pos)
+                                if slot >= 0 and legal_slots[slot]:
+                                    (i, j), orientation = slot_wall(slot)
+                                    game.place_wall(active_player, (i, j), orientation, active_wall)
+                                    if recorder is not None:
+                                        recorder.add_move(("wall", orientation, i, j))
+                                    active_wall = None
+                                    pawn_is_active = False
+                                    highlight_pawn = False
+                                    turn_is_done = True
 
                             # Check if the click was on the board
                             up, down = board_origin[1], board_origin[1] + board_height
@@ -433,11 +407,10 @@ def main():
                                             wall["active"] = False
 
                                 # Make a move
-                                if (i, j) in game.available_moves(game.board, game.pawns_loc[active_player]) \
-                                        and pawn_is_active:
-                                    game.board[i][j]["player"] = active_player
-                                    game.board[game.pawns_loc[active_player][0]][game.pawns_loc[active_player][1]]["player"] = 0
-                                    game.pawns_loc[active_player] = (i, j)
+                                if (i, j) in available_moves and pawn_is_active and not turn_is_done:
+                                    game.move_pawn(active_player, (i, j))
+                                    if recorder is not None:
+                                        recorder.add_move(("pawn", None, i, j))
                                     pawn_is_active = False
                                     highlight_pawn = False
                                     turn_is_done = True
@@ -451,7 +424,6 @@ def main():
 
         # End of the turn
         if turn_is_done:
-            turn += 1
             pawn_is_active = False
             highlight_pawn = False
             active_wall = None
@@ -462,39 +434,140 @@ def main():
                 board_origin[0] + game.pawns_loc[active_player][1] * cell_size + (cell_size - pawn_size) / 2,
                 board_origin[1] + game.pawns_loc[active_player][0] * cell_size + (cell_size - pawn_size) / 2,
                 pawn_size, pawn_size)
-            pygame.draw.rect(screen, COLOR_PLAYERS[str(active_player) + "a"], rect, int(pawn_size//4))
+            draw_rect(screen, COLOR_PLAYERS[str(active_player) + "a"], rect, drawn, int(pawn_size//4))
 
         if game_is_active:
             # A text with an active player's name
             player_name = players_names[active_player]
-            t_your_move = subtitle_font.render(f"Your move, ", True, COLOR_TEXT)
+            t_your_move = render_text(subtitle_font, "Your move, ", COLOR_TEXT)
             t_your_move_rect = t_your_move.get_rect()
             t_your_move_rect.midright = (board_origin[0], height / 12)
-            screen.blit(t_your_move, t_your_move_rect)
+            blit_text(screen, t_your_move, t_your_move_rect, "Your move, ", drawn)
 
-            t_active_player = subtitle_font.render(player_name, True, COLOR_PLAYERS[str(active_player)])
+            t_active_player = render_text(subtitle_font, player_name, COLOR_PLAYERS[str(active_player)])
             t_active_player_rect = t_active_player.get_rect()
             t_active_player_rect.midleft = (t_your_move_rect.right, height / 12)
-            screen.blit(t_active_player, t_active_player_rect)
+            blit_text(screen, t_active_player, t_active_player_rect, player_name, drawn)
 
         # Stop the game and show the winner if there is one
         if game.won(active_player, game.pawns_loc):
             # Text with the winner's name
             player_name = players_names[active_player]
-            t_you_won = subtitle_font.render(f"You won, ", True, COLOR_TEXT)
+            t_you_won = render_text(subtitle_font, "You won, ", COLOR_TEXT)
             t_you_won_rect = t_you_won.get_rect()
             t_you_won_rect.midright = (board_origin[0], height / 12)
-            screen.blit(t_you_won, t_you_won_rect)
+            blit_text(screen, t_you_won, t_you_won_rect, "You won, ", drawn)
 
-            t_active_player = subtitle_font.render(player_name, True, COLOR_PLAYERS[str(active_player)])
+            t_active_player = render_text(subtitle_font, player_name, COLOR_PLAYERS[str(active_player)])
             t_active_player_rect = t_active_player.get_rect()
             t_active_player_rect.midleft = (t_you_won_rect.right, height / 12)
-            screen.blit(t_active_player, t_active_player_rect)
+            blit_text(screen, t_active_player, t_active_player_rect, player_name, drawn)
 
             game_is_active = False
 
-        pygame.display.flip()
-        clock.tick(4)
+        # Update only areas where something appeared or disappeared since the previous frame
+        if DIRTY_RECTS and drawn_before is not None \
+                and not any(event.type == pygame.VIDEOEXPOSE for event in events):
+            pygame.display.update([pygame.Rect(area[0]) for area in drawn ^ drawn_before])
+        else:
+            pygame.display.flip()
+        drawn_before = drawn
+        clock.tick(FPS)
+
+
+def wall_slot(i, j, orientation):
+    """Return an id of a wall place: walls (i, j) are numbered by rows, a horizontal one first."""
+    return (i * (WIDTH - 1) + j) * 2 + WALL_ORIENTATIONS.index(orientation)
+
+
+def slot_wall(slot):
+    """Return a wall ((i, j), orientation) of a slot id."""
+    cell, orientation = divmod(slot, 2)
+    return divmod(cell, WIDTH - 1), WALL_ORIENTATIONS[orientation]
+
+
+def legal_wall_slots(walls):
+    """Return a bitmap of slot ids (bytearray) where walls from the set can be placed."""
+    legal = bytearray((HEIGHT - 1) * (WIDTH - 1) * 2)
+    for (i, j), orientation in walls:
+        legal[wall_slot(i, j, orientation)] = 1
+    return legal
+
+
+def build_wall_slots(board_origin, board_width, board_height, cell_size):
+    """
+    Return a hit-test table (table, left, top, columns, rows) of the board area:
+    table[(y - top) * columns + x - left] is an id of the wall slot under the pixel (x, y) or -1.
+    A wall is aimed by a point between cells: in a horizontal gap for a horizontal wall, in a vertical one
+    for a vertical wall. Slots of the last row and column belong to the previous ones.
+    """
+    def axis(origin, size, cells):
+        # Index of a cell and a position inside the cell for every pixel (None outside of the board)
+        pixels = []
+        for pixel in range(int(origin), int(origin + size) + 1):
+            if origin + 1/6 * cell_size <= pixel <= origin + size:
+                index = int((pixel - origin - 1/6 * cell_size) // cell_size)
+                pixels.append((min(index, cells - 2), (pixel - origin - 1/6 * cell_size) % cell_size))
+            else:
+                pixels.append(None)
+        return pixels
+
+    ys = axis(board_origin[1], board_height, HEIGHT)
+    xs = axis(board_origin[0], board_width, WIDTH)
+    gap = cell_size * 4/6
+    table = array.array("h", [-1]) * (len(xs) * len(ys))
+    for row, y_cell in enumerate(ys):
+        if y_cell is None:
+            continue
+        i, cell_y = y_cell
+        for column, x_cell in enumerate(xs):
+            if x_cell is None:
+                continue
+            j, cell_x = x_cell
+            if cell_y <= gap <= cell_x:
+                table[row * len(xs) + column] = wall_slot(i, j, "vertical")
+            elif cell_y >= gap >= cell_x:
+                table[row * len(xs) + column] = wall_slot(i, j, "horizontal")
+    return table, int(board_origin[0]), int(board_origin[1]), len(xs), len(ys)
+
+
+def wall_slot_at(wall_slots, pos):
+    """Return an id of the wall slot under a mouse position or -1."""
+    table, left, top, columns, rows = wall_slots
+    x, y = pos[0] - left, pos[1] - top
+    if 0 <= x < columns and 0 <= y < rows:
+        return table[y * columns + x]
+    return -1
+
+
+# Rendered texts by (font, text, color), the least recently used are dropped first
+text_cache = OrderedDict()
+
+
+def render_text(font, text, color):
+    """Return a rendered (antialiased) text surface, it is rendered only when it is not in the cache."""
+    key = (font, text, color)
+    surface = text_cache.get(key)
+    if surface is not None:
+        text_cache.move_to_end(key)
+        return surface
+    surface = font.render(text, True, color)
+    text_cache[key] = surface
+    if len(text_cache) > TEXT_CACHE_SIZE:
+        text_cache.popitem(last=False)
+    return surface
+
+
+def draw_rect(surface, color, rect, drawn, width=0):
+    """Draw a rectangle and add its area with the color to the set of drawn areas."""
+    area = pygame.draw.rect(surface, color, rect, width)
+    drawn.add((tuple(area), color, width))
+
+
+def blit_text(surface, text_surface, rect, text, drawn):
+    """Draw a rendered text and add its area with the text to the set of drawn areas."""
+    area = surface.blit(text_surface, rect)
+    drawn.add((tuple(area), text, None))
 
 
 # def draw_pawn():
@@ -504,10 +577,10 @@ def draw_instructions(clock, screen, width, height, title_font, subtitle_font, i
     # Check if game quit
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
-            sys.exit()
+            quit_game()
 
     # Title
-    title = title_font.render("Quoridor", True, COLOR_TEXT)
+    title = render_text(title_font, "Quoridor", COLOR_TEXT)
     title_rect = title.get_rect()
     title_rect.center = ((width / 2), (height / 10))
     screen.blit(title, title_rect)
@@ -519,7 +592,7 @@ def draw_instructions(clock, screen, width, height, title_font, subtitle_font, i
         "You can jump over other pawns but not over walls."
     ]
     for i, rule in enumerate(rules):
-        line = instruction_font.render(rule, True, COLOR_TEXT)
+        line = render_text(instruction_font, rule, COLOR_TEXT)
         line_rect = line.get_rect()
         line_rect.center = ((width / 2), height / 4 + font_size * 3.5 * i)
         screen.blit(line, line_rect)
@@ -530,8 +603,8 @@ def draw_instructions(clock, screen, width, height, title_font, subtitle_font, i
     button_rect_0 = pygame.Rect((1 / 8) * width + 50, height / 2 + 50, width / 4 - 50, width / 4 - 50)
     button_border_rect_0 = pygame.Rect((1 / 8) * width - border_width + 50, height / 2 - border_width + 50,
                                      width / 4 + 2 * border_width - 50, width / 4 + 2 * border_width - 50)
-    button_text = subtitle_font.render("Play", True, COLOR_TEXT)
-    button_text_bottom = instruction_font.render("with friend", True, COLOR_TEXT_2)
+    button_text = render_text(subtitle_font, "Play", COLOR_TEXT)
+    button_text_bottom = render_text(instruction_font, "with friend", COLOR_TEXT_2)
     button_text_rect = button_text.get_rect()
     button_text_bottom_rect = button_text_bottom.get_rect()
     button_text_rect.center = button_rect_0.center
@@ -545,8 +618,8 @@ def draw_instructions(clock, screen, width, height, title_font, subtitle_font, i
     button_rect_1 = pygame.Rect((3 / 8) * width + 50, height / 2 + 50, width / 4 - 50, width / 4 - 50)
     button_border_rect_1 = pygame.Rect((3 / 8) * width - border_width + 50, height / 2 - border_width + 50,
                                      width / 4 + 2 * border_width - 50, width / 4 + 2 * border_width - 50)
-    button_text = subtitle_font.render("Play", True, COLOR_TEXT)
-    button_text_bottom = instruction_font.render("with AI", True, COLOR_TEXT_2)
+    button_text = render_text(subtitle_font, "Play", COLOR_TEXT)
+    button_text_bottom = render_text(instruction_font, "with AI", COLOR_TEXT_2)
     button_text_rect = button_text.get_rect()
     button_text_bottom_rect = button_text_bottom.get_rect()
     button_text_rect.center = button_rect_1.center
@@ -560,8 +633,8 @@ def draw_instructions(clock, screen, width, height, title_font, subtitle_font, i
     button_rect_2 = pygame.Rect((5 / 8) * width + 50, height / 2 + 50, width / 4 - 50, width / 4 - 50)
     button_border_rect_2 = pygame.Rect((5 / 8) * width - border_width + 50, height / 2 - border_width + 50,
                                      width / 4 + 2 * border_width - 50, width / 4 + 2 * border_width - 50)
-    button_text = subtitle_font.render("Play", True, COLOR_TEXT)
-    button_text_bottom = instruction_font.render("AI vs AI", True, COLOR_TEXT_2)
+    button_text = render_text(subtitle_font, "Play", COLOR_TEXT)
+    button_text_bottom = render_text(instruction_font, "AI vs AI", COLOR_TEXT_2)
     button_text_rect = button_text.get_rect()
     button_text_bottom_rect = button_text_bottom.get_rect()
     button_text_rect.center = button_rect_2.center
@@ -0,0 +1,54 @@
+"""
+Tests of AI players.
+Run with: python -m pytest -q
+"""
+import unittest
+
+import AI
+from quoridor import Quoridor
+
+
+def game_without_legal_walls():
+    """Return a 3x3 game where player 1 has walls left, but no wall can be placed."""
+    game = Quoridor(height=3, width=3, walls_number=10)
+    game.place_wall(1, (0, 0), "horizontal")
+    game.place_wall(2, (1, 1), "horizontal")
+    return game
+
+
+class TestSearchAI(unittest.TestCase):
+
+    def test_win_scores_in_transposition_table(self):
+        # A win 5 plies from the root found at ply 2 is a win 4 plies from the root at ply 1 of another line
+        stored = AI.score_to_tt(AI.WIN_SCORE - 5, 2)
+        self.assertEqual(AI.score_from_tt(stored, 1), AI.WIN_SCORE - 4)
+        self.assertEqual(AI.score_from_tt(AI.score_to_tt(-(AI.WIN_SCORE - 5), 2), 1), -(AI.WIN_SCORE - 4))
+        self.assertEqual(AI.score_from_tt(AI.score_to_tt(120, 2), 1), 120)
+
+    def test_shortest_win(self):
+        game = Quoridor(height=5, width=5, walls_number=0)
+        for loc in [(3, 2), (2, 2), (1, 2)]:
+            game.move_pawn(1, loc)
+            game.move_pawn(2, (4 - loc[0], 1))
+        ai = AI.SearchAI(time_limit=1, max_depth=4, endgame=False)
+        self.assertEqual(ai.move(game, 1), ("pawn", None, 0, 2))
+
+
+class TestPrimitiveAI(unittest.TestCase):
+
+    def test_no_candidate_walls(self):
+        game = game_without_legal_walls()
+        self.assertFalse(game.legal_walls)
+        self.assertTrue(game.walls_left(1))
+        for ai in (AI.PrimitiveAI(), AI.PrimitiveAI(workers=2), AI.PrimitiveAI(workers=2, pruning=True)):
+            try:
+                self.assertEqual(ai.rate_walls_parallel(game, 1, []), [])
+                item, orientation, i, j = ai.move(game, 1)
+            finally:
+                ai.close()
+            self.assertEqual(item, "pawn")
+            self.assertIn((i, j), game.legal_pawn_moves)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+Tests of the opening book file.
+Run with: python -m pytest -q
+"""
+import os
+import tempfile
+import unittest
+
+from book import OpeningBook, play, write_book
+from quoridor import Quoridor
+
+
+class TestOpeningBook(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".bin")
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_write_and_probe(self):
+        game = Quoridor()
+        after_pawn = play(game, ("pawn", None, 7, 4))
+        after_wall = play(after_pawn, ("wall", "vertical", 0, 3))
+        moves = {
+            game.key: ("pawn", None, 7, 4),
+            after_pawn.key: ("wall", "vertical", 0, 3),
+            after_wall.key: ("wall", "horizontal", 6, 4)
+        }
+        write_book(self.path, game, moves)
+
+        book = OpeningBook(self.path)
+        try:
+            self.assertEqual(len(book), 3)
+            self.assertTrue(book.matches(game))
+            self.assertFalse(book.matches(Quoridor(height=7, width=7)))
+            for key, move in moves.items():
+                self.assertEqual(book.probe(key), move)
+            self.assertIsNone(book.probe(game.key ^ 1))
+            self.assertEqual(book.move(after_pawn, 2), ("wall", "vertical", 0, 3))
+            # Only the player to move gets a book move
+            self.assertIsNone(book.move(after_pawn, 1))
+            self.assertEqual(book.stats(), {"entries": 3, "hits": 4, "misses": 1})
+        finally:
+            book.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Tests of the endgame solver against a brute-force search.
+Run with: python -m pytest -q
+"""
+import copy
+import random
+import unittest
+from functools import lru_cache
+
+from endgame import EndgameSolver, RaceTable, WIN, LOSS
+from quoridor import Quoridor
+
+
+def race_game(seed, backend="dict"):
+    """Return a 5x5 game where both players used all their walls."""
+    rng = random.Random(seed)
+    game = Quoridor(height=5, width=5, walls_number=3, backend=backend)
+    while game.walls_left(2):
+        game.place_wall(game.player(game.turn), *rng.choice(sorted(game.legal_walls)))
+    return game
+
+
+def brute_force(game):
+    """
+    Return solve(first, second, mover, plies): True if the player to move wins within the plies,
+    False if it loses within them and None if neither is forced.
+    """
+    @lru_cache(maxsize=None)
+    def solve(first, second, mover, plies):
+        pawns_loc = {1: first, 2: second}
+        opponent = 2 if mover == 1 else 1
+        if game.won(opponent, pawns_loc):
+            return False
+        if plies == 0:
+            return None
+        board = copy.deepcopy(game.board)
+        board_pawns = dict(game.pawns_loc)
+        # Pawn 2 leaves the way of pawn 1 first
+        for cell in [(0, 0), (0, 1)]:
+            if cell != first and cell != board_pawns[1]:
+                game.apply_pawn_move(board, board_pawns, 2, cell)
+                break
+        game.apply_pawn_move(board, board_pawns, 1, first)
+        game.apply_pawn_move(board, board_pawns, 2, second)
+        undecided = False
+        for cell in set(game.available_moves(board, pawns_loc[mover])):
+            result = solve(cell, second, 2, plies - 1) if mover == 1 else solve(first, cell, 1, plies - 1)
+            if result is False:
+                return True
+            if result is None:
+                undecided = True
+        return None if undecided else False
+    return solve
+
+
+class TestRaceTable(unittest.TestCase):
+
+    def test_against_brute_force(self):
+        for backend in ("dict", "bitboard"):
+            for seed in range(3):
+                game = race_game(seed, backend)
+                table = RaceTable(game, game.board)
+                solve = brute_force(game)
+                rng = random.Random(seed)
+                cells = [(i, j) for i in range(5) for j in range(5)]
+                checked = 0
+                while checked < 60:
+                    first, second = rng.sample(cells, 2)
+                    mover = rng.choice((1, 2))
+                    if game.won(1, {1: first, 2: second}) or game.won(2, {1: first, 2: second}):
+                        continue
+                    checked += 1
+                    result, plies, loc = table.lookup({1: first, 2: second}, mover)
+                    position = (backend, seed, first, second, mover)
+                    if result == WIN:
+                        # The win is forced and no faster win exists
+                        self.assertIs(solve(first, second, mover, plies), True, position)
+                        self.assertIsNot(solve(first, second, mover, plies - 1), True, position)
+                        new_first, new_second = (loc, second) if mover == 1 else (first, loc)
+                        self.assertIs(solve(new_first, new_second, 2 if mover == 1 else 1, plies - 1), False,
+                                      position)
+                    elif result == LOSS:
+                        self.assertIs(solve(first, second, mover, plies), False, position)
+
+
+class TestEndgameSolver(unittest.TestCase):
+
+    def test_move_without_walls(self):
+        game = race_game(0)
+        solver = EndgameSolver()
+        solver.table(game, game.board)
+        move = solver.move(game, game.board, game.pawns_loc, {1: 0, 2: 0}, 1)
+        self.assertEqual(move[0], "pawn")
+        self.assertIn(move[2:], game.legal_pawn_moves)
+        self.assertIsNone(solver.move(game, game.board, game.pawns_loc, {1: 1, 2: 0}, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
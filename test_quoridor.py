@@ -0,0 +1,110 @@
+"""
+Randomized equivalence tests of incremental game state against full recomputation.
+Run with: python -m pytest -q
+"""
+import random
+import unittest
+
+from quoridor import Quoridor
+
+SIZES = [(9, 9), (5, 7), (7, 5), (3, 3)]
+GAMES = 12
+PLIES = 60
+
+
+def random_game(seed, backend="dict"):
+    """Return a random game (with many walls per player) and its random generator."""
+    rng = random.Random(seed)
+    height, width = rng.choice(SIZES)
+    return Quoridor(height=height, width=width, walls_number=20, backend=backend), rng
+
+
+def random_moves(game, rng):
+    """Play random legal moves and yield the game after every move."""
+    for _ in range(PLIES):
+        player = game.player(game.turn)
+        if game.legal_walls and game.walls_left(player) and rng.random() < 0.5:
+            game.place_wall(player, *rng.choice(sorted(game.legal_walls)))
+        else:
+            game.move_pawn(player, rng.choice(sorted(game.legal_pawn_moves)))
+        if game.won(player, game.pawns_loc):
+            return
+        yield game
+
+
+class TestLegalWalls(unittest.TestCase):
+
+    def test_incremental_legal_walls(self):
+        for backend in ("dict", "bitboard"):
+            for seed in range(GAMES):
+                game, rng = random_game(seed, backend)
+                for game in random_moves(game, rng):
+                    expected = game.filter_walls(game.board, game.pawns_loc, game.free_walls(game.board))
+                    self.assertEqual(game.legal_walls, expected, (backend, seed, game.turn))
+
+
+class TestDistanceMaps(unittest.TestCase):
+
+    def test_update_distance_map(self):
+        for backend in ("dict", "bitboard"):
+            for seed in range(GAMES):
+                game, rng = random_game(seed, backend)
+                maps = game.distance_maps(game.board)
+                free_walls = sorted(game.free_walls(game.board))
+                while free_walls:
+                    loc, orientation = rng.choice(free_walls)
+                    game.apply_wall(game.board, loc, orientation)
+                    walls_key = game.walls_key(game.board) if rng.random() < 0.5 else None
+                    maps = {player: game.update_distance_map(game.board, distances, loc, orientation, walls_key)
+                            for player, distances in maps.items()}
+                    self.assertEqual(maps, game.distance_maps(game.board), (backend, seed, loc, orientation))
+                    free_walls = sorted(game.free_walls(game.board))
+
+
+class TestKeys(unittest.TestCase):
+
+    def test_incremental_key(self):
+        for backend in ("dict", "bitboard"):
+            for seed in range(GAMES):
+                game, rng = random_game(seed, backend)
+                for game in random_moves(game, rng):
+                    walls_left = {player: game.walls_left(player) for player in game.walls}
+                    expected = game.position_key(game.board, game.pawns_loc, walls_left, game.player(game.turn))
+                    self.assertEqual(game.key, expected, (backend, seed, game.turn))
+
+
+class TestBackends(unittest.TestCase):
+
+    def test_dict_and_bitboard(self):
+        for seed in range(GAMES):
+            games = [random_game(seed, backend)[0] for backend in ("dict", "bitboard")]
+            rng = random.Random(seed)
+            for _ in range(PLIES):
+                dict_game, bit_game = games
+                self.assertEqual(dict_game.key, bit_game.key)
+                self.assertEqual(dict_game.walls_key(dict_game.board), bit_game.walls_key(bit_game.board))
+                self.assertEqual(dict_game.free_walls(dict_game.board), bit_game.free_walls(bit_game.board))
+                self.assertEqual(dict_game.legal_walls, bit_game.legal_walls)
+                self.assertEqual(dict_game.legal_pawn_moves, bit_game.legal_pawn_moves)
+                self.assertEqual(dict_game.distance_maps(dict_game.board), bit_game.distance_maps(bit_game.board))
+                for pawn, loc in dict_game.pawns_loc.items():
+                    self.assertEqual(sorted(dict_game.available_moves(dict_game.board, loc)),
+                                     sorted(bit_game.available_moves(bit_game.board, loc)), (seed, pawn))
+                    self.assertEqual(dict_game.path_finder(dict_game.board, pawn, dict_game.pawns_loc),
+                                     bit_game.path_finder(bit_game.board, pawn, bit_game.pawns_loc))
+
+                player = dict_game.player(dict_game.turn)
+                if dict_game.legal_walls and dict_game.walls_left(player) and rng.random() < 0.5:
+                    wall = rng.choice(sorted(dict_game.legal_walls))
+                    for game in games:
+                        game.place_wall(player, *wall)
+                else:
+                    loc = rng.choice(sorted(dict_game.legal_pawn_moves))
+                    for game in games:
+                        game.move_pawn(player, loc)
+                if dict_game.won(player, dict_game.pawns_loc):
+                    break
+
+
+if __name__ == "__main__":
+    unittest.main()
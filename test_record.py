@@ -0,0 +1,102 @@
+"""
+Tests of game records.
+Run with: python -m pytest -q
+"""
+import os
+import random
+import tempfile
+import unittest
+
+from quoridor import Quoridor
+from record import RecordReader, RecordWriter, move_size
+
+
+def random_moves(game, seed, plies=30):
+    """Play random moves in the game and return them."""
+    rng = random.Random(seed)
+    moves = []
+    for _ in range(plies):
+        player = game.player(game.turn)
+        if game.legal_walls and game.walls_left(player) and rng.random() < 0.3:
+            (i, j), orientation = rng.choice(sorted(game.legal_walls))
+            game.place_wall(player, (i, j), orientation)
+            moves.append(("wall", orientation, i, j))
+        else:
+            i, j = rng.choice(sorted(game.legal_pawn_moves))
+            game.move_pawn(player, (i, j))
+            moves.append(("pawn", None, i, j))
+        if game.won(player, game.pawns_loc):
+            break
+    return moves
+
+
+class TestRecord(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".qrec")
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_write_and_read(self):
+        # 9x9 moves take one byte, 13x13 moves take two bytes
+        games = []
+        for seed, (height, width) in enumerate([(9, 9), (13, 13), (9, 9)]):
+            game = Quoridor(height=height, width=width)
+            games.append((game, random_moves(game, seed)))
+        self.assertEqual([move_size(game.height, game.width) for game, moves in games], [1, 2, 1])
+        with RecordWriter(self.path) as writer:
+            for game, moves in games:
+                writer.write_game(game, moves)
+
+        records = list(RecordReader(self.path))
+        self.assertEqual(len(records), len(games))
+        for record, (game, moves) in zip(records, games):
+            self.assertTrue(record.finished)
+            self.assertEqual((record.height, record.width), (game.height, game.width))
+            self.assertEqual(list(record.moves()), moves)
+            self.assertEqual(record.final().key, game.key)
+
+    def test_interrupted_game(self):
+        first = Quoridor(height=13, width=13)
+        first_moves = random_moves(first, 1)
+        with RecordWriter(self.path) as writer:
+            writer.write_game(first, first_moves)
+        second = Quoridor(height=13, width=13)
+        second_moves = random_moves(second, 2)
+        writer = RecordWriter(self.path)
+        writer.start_game(second)
+        for move in second_moves:
+            writer.add_move(move)
+        # The writer is not closed: the last game has no END
+        writer.file.close()
+
+        records = list(RecordReader(self.path))
+        self.assertEqual([record.finished for record in records], [True, False])
+        self.assertEqual(list(records[1].moves()), second_moves)
+
+        # Opening the file again finishes the interrupted game
+        with RecordWriter(self.path) as writer:
+            writer.write_game(first, first_moves)
+        records = list(RecordReader(self.path))
+        self.assertEqual([record.finished for record in records], [True, True, True])
+        self.assertEqual([list(record.moves()) for record in records], [first_moves, second_moves, first_moves])
+
+    def test_game_without_moves(self):
+        with RecordWriter(self.path) as writer:
+            writer.start_game(Quoridor())
+            writer.start_game(Quoridor())
+            writer.add_move(("pawn", None, 7, 4))
+            writer.start_game(Quoridor())
+        records = list(RecordReader(self.path))
+        self.assertEqual([len(record) for record in records], [1])
+
+    def test_board_too_large(self):
+        self.assertEqual(move_size(148, 148), 2)
+        with self.assertRaises(ValueError):
+            move_size(149, 149)
+
+
+if __name__ == "__main__":
+    unittest.main()
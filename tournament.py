@@ -0,0 +1,237 @@
+"""
+Headless AI-vs-AI tournament.
+Example:
+    python tournament.py SearchAI PrimitiveAI "MCTSAI:time_limit=0.2" --games 20 --workers 4 --output results.json
+An AI is given as a class name from AI.py with optional keyword arguments after a colon.
+"""
+import argparse
+import ast
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import AI
+from quoridor import Quoridor
+from record import RecordWriter
+
+# Elo of every AI before the first game and the update factor
+ELO_START = 1500
+ELO_K = 16
+
+
+def parse_ai(spec):
+    """Return (class name, keyword arguments) of an AI given as "Name" or "Name:option=value,option=value"."""
+    name, _, options = spec.partition(":")
+    if not isinstance(getattr(AI, name, None), type):
+        raise ValueError(f"Unknown AI: {name}")
+    kwargs = {}
+    for option in filter(None, options.split(",")):
+        key, _, value = option.partition("=")
+        kwargs[key.strip()] = ast.literal_eval(value.strip())
+    return name, kwargs
+
+
+def play_game(task):
+    """
+    Play one game without a window and return its record.
+    task = (game index, seed, {player: AI spec}, (height, width, walls_number, backend), max_plies)
+    """
+    index, seed, specs, settings, max_plies = task
+    height, width, walls_number, backend = settings
+    random.seed(seed)
+    game = Quoridor(height=height, width=width, walls_number=walls_number, backend=backend)
+    ais = {}
+    for player, spec in specs.items():
+        name, kwargs = parse_ai(spec)
+        ais[player] = getattr(AI, name)(**kwargs)
+
+    latencies = {player: [] for player in specs}
+    moves = []
+    winner = None
+    forfeit = False
+    error = None
+    try:
+        while game.turn < max_plies:
+            player = game.player(game.turn)
+            start = time.perf_counter()
+            try:
+                item, orientation, i, j = ais[player].move(game, player)
+            except Exception as exception:
+                # A failed AI loses the game like an illegal move, the tournament goes on
+                winner = 2 if player == 1 else 1
+                forfeit = True
+                error = f"{specs[player]}: {type(exception).__name__}: {exception}"
+                break
+            latencies[player].append(time.perf_counter() - start)
+
+            if item == "pawn" and (i, j) in game.legal_pawn_moves:
+                game.move_pawn(player, (i, j))
+            elif item == "wall" and game.walls_left(player) and ((i, j), orientation) in game.legal_walls:
+                game.place_wall(player, (i, j), orientation)
+            else:
+                # An illegal move loses the game
+                winner = 2 if player == 1 else 1
+                forfeit = True
+                break
+            moves.append((item, orientation, i, j))
+            if game.won(player, game.pawns_loc):
+                winner = player
+                break
+    finally:
+        for ai in ais.values():
+            if hasattr(ai, "close"):
+                ai.close()
+
+    return {
+        "game": index,
+        "seed": seed,
+        "players": {player: specs[player] for player in specs},
+        "winner": specs[winner] if winner else None,
+        "plies": game.turn,
+        "forfeit": forfeit,
+        "error": error,
+        "moves": moves,
+        "latencies": {specs[player]: latencies[player] for player in specs}
+    }
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of the values."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = max(1, -(-q * len(values) // 100))
+    return values[int(rank) - 1]
+
+
+def elo_ratings(records, names):
+    """Ratings after updating them with every game in the order of games (a draw counts as half a win)."""
+    ratings = {name: ELO_START for name in names}
+    for record in sorted(records, key=lambda record: record["game"]):
+        first, second = record["players"][1], record["players"][2]
+        if first == second:
+            continue
+        expected = 1 / (1 + 10 ** ((ratings[second] - ratings[first]) / 400))
+        if record["winner"] is None:
+            score = 0.5
+        else:
+            score = 1.0 if record["winner"] == first else 0.0
+        ratings[first] += ELO_K * (score - expected)
+        ratings[second] -= ELO_K * (score - expected)
+    return ratings
+
+
+def schedule(specs, games, seed):
+    """
+    Return tasks of a round robin: every pair of AIs plays the given number of games with alternating sides.
+    Seeds of games are derived from the base seed, so a tournament can be repeated.
+    """
+    pairs = [(first, second) for n, first in enumerate(specs) for second in specs[n + 1:]] or [(specs[0], specs[0])]
+    tasks = []
+    for first, second in pairs:
+        for n in range(games):
+            players = {1: first, 2: second} if n % 2 == 0 else {1: second, 2: first}
+            tasks.append((len(tasks), seed + len(tasks), players))
+    return tasks
+
+
+def summarize(records, names, elapsed):
+    """Return the results summary of a tournament."""
+    plies = [record["plies"] for record in records]
+    moves = sum(plies)
+    summary = {
+        "games": len(records),
+        "draws": sum(record["winner"] is None for record in records),
+        "forfeits": sum(record["forfeit"] for record in records),
+        "errors": sum(record["error"] is not None for record in records),
+        "plies": {
+            "mean": moves / len(records) if records else 0.0,
+            "min": min(plies, default=0),
+            "max": max(plies, default=0)
+        },
+        "time": elapsed,
+        "moves_per_second": moves / elapsed if elapsed else 0.0,
+        "ai": {}
+    }
+    ratings = elo_ratings(records, names)
+    for name in names:
+        latencies = [latency for record in records for latency in record["latencies"].get(name, [])]
+        thinking = sum(latencies)
+        summary["ai"][name] = {
+            "games": sum(name in record["players"].values() for record in records),
+            "wins": sum(record["winner"] == name for record in records),
+            "moves": len(latencies),
+            "moves_per_second": len(latencies) / thinking if thinking else 0.0,
+            "latency": {f"p{q}": percentile(latencies, q) for q in (50, 90, 99)} | {"max": max(latencies, default=0.0)},
+            "elo": round(ratings[name], 1)
+        }
+    return summary
+
+
+def print_summary(summary):
+    print(f"Games: {summary['games']}, draws: {summary['draws']}, forfeits: {summary['forfeits']} "
+          f"(errors: {summary['errors']})")
+    print(f"Plies per game: mean {summary['plies']['mean']:.1f}, min {summary['plies']['min']}, "
+          f"max {summary['plies']['max']}")
+    print(f"Time: {summary['time']:.1f} s, {summary['moves_per_second']:.1f} moves/s")
+    print(f"{'AI':<40}{'games':>7}{'wins':>7}{'moves/s':>10}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'elo':>9}")
+    for name, stats in sorted(summary["ai"].items(), key=lambda item: -item[1]["elo"]):
+        latency = stats["latency"]
+        print(f"{name:<40}{stats['games']:>7}{stats['wins']:>7}{stats['moves_per_second']:>10.1f}"
+              f"{latency['p50'] * 1000:>9.1f}{latency['p90'] * 1000:>9.1f}{latency['p99'] * 1000:>9.1f}"
+              f"{stats['elo']:>9.1f}")
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Play AI-vs-AI Quoridor games without a window.")
+    parser.add_argument("ai", nargs="+", help="AI classes from AI.py, e.g. SearchAI or \"MCTSAI:time_limit=0.2\"")
+    parser.add_argument("--games", type=int, default=10, help="games for every pair of AIs")
+    parser.add_argument("--workers", type=int, default=1, help="processes playing games in parallel")
+    parser.add_argument("--height", type=int, default=9)
+    parser.add_argument("--width", type=int, default=9)
+    parser.add_argument("--walls", type=int, default=10, help="walls per player")
+    parser.add_argument("--backend", choices=("dict", "bitboard"), default="dict")
+    parser.add_argument("--max-plies", type=int, default=400, help="a game is a draw after this number of plies")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write records and the summary to this JSON file")
+    parser.add_argument("--record", help="append games to this game record file (see record.py)")
+    args = parser.parse_args(args)
+
+    specs = list(dict.fromkeys(args.ai))
+    for spec in specs:
+        parse_ai(spec)
+    settings = (args.height, args.width, args.walls, args.backend)
+    tasks = [(index, seed, players, settings, args.max_plies)
+             for index, seed, players in schedule(specs, args.games, args.seed)]
+
+    writer = None
+    if args.record:
+        settings_game = Quoridor(height=args.height, width=args.width, walls_number=args.walls)
+        writer = RecordWriter(args.record)
+    start = time.perf_counter()
+    records = []
+    executor = ProcessPoolExecutor(args.workers) if args.workers > 1 else None
+    try:
+        games = executor.map(play_game, tasks) if executor is not None else map(play_game, tasks)
+        # Every game is recorded when it is finished, so an interrupted tournament keeps the games played
+        for record in games:
+            records.append(record)
+            if writer is not None:
+                writer.write_game(settings_game, record["moves"])
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if writer is not None:
+            writer.close()
+    summary = summarize(records, specs, time.perf_counter() - start)
+
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"settings": vars(args), "summary": summary, "games": records}, file, indent=2)
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+EXACT = 0
+LOWER = 1  # value is a lower bound (search failed high)
+UPPER = 2  # value is an upper bound (search failed low)
+
+# Approximate memory used by one entry (list slots, int objects and a shared move tuple)
+ENTRY_SIZE = 128
+
+
+class TranspositionTable:
+    """
+    Fixed-size table of searched positions indexed by Zobrist keys (Quoridor.key).
+    Every entry stores a depth, a value, a bound flag and a best move.
+    Replacement policies:
+        "depth" - keep the deeper entry unless the stored one is from an older search (new_search),
+        "always" - always replace.
+    """
+
+    def __init__(self, memory=16 * 2 ** 20, replacement="depth"):
+        if replacement not in ("depth", "always"):
+            raise ValueError(f"Unknown replacement policy: {replacement}")
+        self.replacement = replacement
+
+        # Number of entries is the largest power of two that fits the memory budget
+        self.size = 1
+        while self.size * 2 * ENTRY_SIZE <= memory:
+            self.size *= 2
+        self.mask = self.size - 1
+
+        self.keys = [None] * self.size
+        self.depths = [0] * self.size
+        self.values = [0] * self.size
+        self.flags = [EXACT] * self.size
+        self.moves = [None] * self.size
+        self.generations = [0] * self.size
+        self.generation = 0
+        self.filled = 0
+
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+        self.rejected = 0
+
+    def new_search(self):
+        """Mark stored entries as old, so they are replaced first."""
+        self.generation += 1
+
+    def clear(self):
+        self.__init__(self.size * ENTRY_SIZE, self.replacement)
+
+    def probe(self, key):
+        """Return (depth, value, flag, move) stored for the key or None."""
+        index = key & self.mask
+        self.probes += 1
+        stored_key = self.keys[index]
+        if stored_key == key:
+            self.hits += 1
+            return self.depths[index], self.values[index], self.flags[index], self.moves[index]
+        if stored_key is not None:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, value, flag, move):
+        """Store a search result according to the replacement policy."""
+        index = key & self.mask
+        stored_key = self.keys[index]
+        if stored_key is None:
+            self.filled += 1
+        elif stored_key != key:
+            if self.replacement == "depth" and self.generations[index] == self.generation \
+                    and self.depths[index] > depth:
+                self.rejected += 1
+                return
+            self.overwrites += 1
+        elif self.replacement == "depth" and self.depths[index] > depth:
+            # Keep a deeper result for the same position, but remember the new best move
+            if move is not None:
+                self.moves[index] = move
+            return
+
+        self.keys[index] = key
+        self.depths[index] = depth
+        self.values[index] = value
+        self.flags[index] = flag
+        self.moves[index] = move
+        self.generations[index] = self.generation
+        self.stores += 1
+
+    def cutoff(self, entry, depth, alpha, beta):
+        """Return a value of the entry if it is deep enough to replace a search in the (alpha, beta) window."""
+        if entry is None:
+            return None
+        entry_depth, value, flag, move = entry
+        if entry_depth < depth:
+            return None
+        if flag == EXACT \
+                or flag == LOWER and value >= beta \
+                or flag == UPPER and value <= alpha:
+            return value
+        return None
+
+    def stats(self):
+        """Return probes, hits, hit rate, collisions, stores and occupancy of the table."""
+        return {
+            "size": self.size,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+            "collisions": self.collisions,
+            "stores": self.stores,
+            "overwrites": self.overwrites,
+            "rejected": self.rejected,
+            "occupancy": self.filled / self.size
+        }